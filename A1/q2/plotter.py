@@ -1,4 +1,5 @@
 import os
+import json
 import argparse
 import sys
 
@@ -14,32 +15,68 @@ except ImportError:
     print("="*60 + "\n")
     sys.exit(0) 
 
+def load_text_results(timing_file):
+    supports = []
+    times = {}
+    with open(timing_file, 'r') as f:
+        for line in f:
+            if ':' not in line:
+                continue
+            name, values = line.split(':', 1)
+            if name == "Supports":
+                supports = list(map(int, values.strip().split(',')))
+            else:
+                times[name] = list(map(float, values.strip().split(',')))
+    return supports, times
+
+def load_json_results(json_file):
+    """
+    Supports, median times and (lower, upper) error-bar lengths from the
+    interquartile range per miner, as written by runner.py. Runs without a
+    median (failed or censored) come back as nan so they leave a gap in the
+    line; runs killed for exceeding a budget are also returned per miner as
+    (support, seconds) points, the seconds being only a lower bound.
+    """
+    with open(json_file, 'r') as f:
+        data = json.load(f)
+    supports = data['supports']
+    times, errors, censored = {}, {}, {}
+    for algo, runs in data['results'].items():
+        med, lower, upper, over = [], [], [], []
+        for s in supports:
+            run = runs.get(str(s), {})
+            m = run.get('wall_median_s', float('nan'))
+            med.append(m)
+            lower.append(m - run.get('wall_q1_s', m))
+            upper.append(run.get('wall_q3_s', m) - m)
+            if 'wall_lower_bound_s' in run:
+                over.append((s, run['wall_lower_bound_s']))
+        times[algo] = med
+        errors[algo] = (lower, upper)
+        censored[algo] = over
+    return supports, times, errors, censored
+
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument('--outdir', required=True)
     args = parser.parse_args()
 
     timing_file = os.path.join(args.outdir, "timing_results.txt")
+    json_file = os.path.join(args.outdir, "timing_results.json")
     
-    supports = []
-    times = {}
-
+    errors, censored = {}, {}
     try:
-        with open(timing_file, 'r') as f:
-            lines = f.readlines()
-            for line in lines:
-                if line.startswith("Supports:"):
-                    supports = list(map(int, line.split(":")[1].strip().split(',')))
-                elif line.startswith("gSpan:"):
-                    times['gSpan'] = list(map(float, line.split(":")[1].strip().split(',')))
-                elif line.startswith("FSG:"):
-                    times['FSG'] = list(map(float, line.split(":")[1].strip().split(',')))
-                elif line.startswith("Gaston:"):
-                    times['Gaston'] = list(map(float, line.split(":")[1].strip().split(',')))
+        if os.path.exists(json_file):
+            supports, times, errors, censored = load_json_results(json_file)
+        else:
+            supports, times = load_text_results(timing_file)
     except FileNotFoundError:
         print(f"Timing results file not found at: {timing_file}")
         print("Please ensure runner.py finished successfully.")
         return
+    except (ValueError, KeyError) as e:
+        print(f"Could not read timing results: {e}")
+        return
     
     if not supports or not times:
         print("Timing data is empty or incomplete. Cannot plot.")
@@ -48,19 +85,25 @@ def main():
     try:
         plt.figure(figsize=(10, 6))
         
-        markers = {'gSpan': 'o', 'FSG': 's', 'Gaston': '^'}
-        colors = {'gSpan': 'blue', 'FSG': 'red', 'Gaston': 'green'}
+        markers = {'gSpan': 'o', 'FSG': 's', 'Gaston': '^', 'PyGSpan': 'D'}
+        colors = {'gSpan': 'blue', 'FSG': 'red', 'Gaston': 'green', 'PyGSpan': 'purple'}
 
         for algo, data in times.items():
             if len(data) == len(supports):
-                plt.plot(supports, data, marker=markers.get(algo, 'x'), 
-                         label=algo, color=colors.get(algo, 'black'), linewidth=2)
+                plt.errorbar(supports, data, yerr=errors.get(algo), marker=markers.get(algo, 'x'),
+                             label=algo, color=colors.get(algo, 'black'), linewidth=2, capsize=4)
             else:
                 print(f"Warning: Data length mismatch for {algo}. Skipping.")
+            if censored.get(algo):
+                # Hollow markers: killed at the budget, so the real time is higher
+                xs, ys = zip(*censored[algo])
+                plt.scatter(xs, ys, marker=markers.get(algo, 'x'), facecolors='none',
+                            edgecolors=colors.get(algo, 'black'), s=80,
+                            label=f"{algo} (over budget, lower bound)")
 
         plt.xlabel('Support Threshold (%)', fontsize=12)
         plt.ylabel('Execution Time (seconds)', fontsize=12)
-        plt.title('Performance Comparison: gSpan vs FSG vs Gaston', fontsize=14)
+        plt.title(f"Performance Comparison: {' vs '.join(times)}", fontsize=14)
         plt.legend()
         plt.grid(True, linestyle='--', alpha=0.7)
         plt.xticks(supports)
@@ -0,0 +1,294 @@
+import os
+import sys
+import argparse
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+
+from runner import parse_dataset_robust
+
+# Pure-Python gSpan, a baseline runner.py can time next to the external
+# miners. Patterns grow along DFS codes: 5-tuples (from, to, from label,
+# edge label, to label), with -1 for labels already fixed by earlier
+# entries. A code is only expanded if it is the minimum DFS code of its
+# pattern, so every pattern is reported exactly once.
+#
+# Graphs are array-backed: labels[v] is a vertex label and adj[v] a tuple
+# of (from, to, edge label, edge id) edges. An embedding (projection) is a
+# (graph id, edge, previous embedding) chain, one link per code entry.
+# Independent subtrees of the search, one per frequent first edge, are
+# mined in a process pool.
+
+def build_graphs(graphs):
+    """Array-backed (labels, adj) graphs from parse_dataset_robust's dicts."""
+    built = []
+    for g in graphs:
+        labels = [int(l) for l in g['nodes']]
+        adj = [[] for _ in labels]
+        eid = 0
+        for u, v, l in g['edges']:
+            u, v, l = int(u), int(v), int(l)
+            if u == v:
+                continue
+            adj[u].append((u, v, l, eid))
+            adj[v].append((v, u, l, eid))
+            eid += 1
+        built.append((labels, [tuple(a) for a in adj]))
+    return built
+
+def code_graph(code):
+    """The pattern graph of a DFS code, in the same (labels, adj) form."""
+    labels = [0] * (max(max(c[0], c[1]) for c in code) + 1)
+    adj = [[] for _ in labels]
+    for eid, (frm, to, frm_label, elabel, to_label) in enumerate(code):
+        if frm_label != -1:
+            labels[frm] = frm_label
+        if to_label != -1:
+            labels[to] = to_label
+        adj[frm].append((frm, to, elabel, eid))
+        adj[to].append((to, frm, elabel, eid))
+    return labels, [tuple(a) for a in adj]
+
+def rightmost_path(code):
+    """Indices of the code entries on the rightmost path, rightmost edge first."""
+    rmpath = []
+    old_from = -1
+    for i in range(len(code) - 1, -1, -1):
+        frm, to = code[i][0], code[i][1]
+        if frm < to and (not rmpath or old_from == to):
+            rmpath.append(i)
+            old_from = frm
+    return rmpath
+
+def history(embedding):
+    """Graph edges of an embedding in code order, plus its used edge ids and vertices."""
+    edges = []
+    while embedding is not None:
+        edges.append(embedding[1])
+        embedding = embedding[2]
+    edges.reverse()
+    return edges, {e[3] for e in edges}, {v for e in edges for v in e[:2]}
+
+def backward_edge(graph, e1, e2, used_edges):
+    """Unused edge closing a cycle from the rightmost vertex (end of e2) to the start of e1."""
+    labels, adj = graph
+    if e1 is e2:
+        return None
+    for e in adj[e2[1]]:
+        if e[3] in used_edges or e[1] != e1[0]:
+            continue
+        if e1[2] < e[2] or (e1[2] == e[2] and labels[e1[1]] <= labels[e2[1]]):
+            return e
+    return None
+
+def forward_pure(graph, e, min_label, used_vertices):
+    """Edges growing a new vertex from the rightmost vertex (end of e)."""
+    labels, adj = graph
+    return [e2 for e2 in adj[e[1]]
+            if labels[e2[1]] >= min_label and e2[1] not in used_vertices]
+
+def forward_rmpath(graph, e, min_label, used_vertices):
+    """Edges growing a new vertex from the start of e, a rightmost-path edge."""
+    labels, adj = graph
+    to_label = labels[e[1]]
+    found = []
+    for e2 in adj[e[0]]:
+        label2 = labels[e2[1]]
+        if e[1] == e2[1] or label2 < min_label or e2[1] in used_vertices:
+            continue
+        if e[2] < e2[2] or (e[2] == e2[2] and to_label <= label2):
+            found.append(e2)
+    return found
+
+def root_embeddings(graphs, first_edge=None):
+    """One-edge embeddings grouped by (from label, edge label, to label), optionally one key only."""
+    roots = defaultdict(list)
+    for gid, (labels, adj) in enumerate(graphs):
+        for v, edges in enumerate(adj):
+            for e in edges:
+                if labels[v] <= labels[e[1]]:
+                    key = (labels[v], e[2], labels[e[1]])
+                    if first_edge is None or key == first_edge:
+                        roots[key].append((gid, e, None))
+    return roots
+
+def support(projected):
+    return len({p[0] for p in projected})
+
+def is_min(code):
+    """True if code is the minimum DFS code of the pattern it describes."""
+    if len(code) == 1:
+        return True
+    graph = code_graph(code)
+    roots = root_embeddings([graph])
+    first = min(roots)
+    min_code = [(0, 1) + first]
+    projected = roots[first]
+
+    while True:
+        rmpath = rightmost_path(min_code)
+        min_label = min_code[0][2]
+        maxtoc = min_code[rmpath[0]][1]
+
+        grown = defaultdict(list)
+        new_entry = None
+        for i in range(len(rmpath) - 1, 0, -1):
+            for p in projected:
+                edges, used_edges, _ = history(p)
+                e = backward_edge(graph, edges[rmpath[i]], edges[rmpath[0]], used_edges)
+                if e is not None:
+                    grown[e[2]].append((0, e, p))
+                    new_to = min_code[rmpath[i]][0]
+            if grown:
+                elabel = min(grown)
+                new_entry = (maxtoc, new_to, -1, elabel, -1)
+                projected = grown[elabel]
+                break
+
+        if new_entry is None:
+            for i in [None] + list(range(len(rmpath))):
+                for p in projected:
+                    edges, _, used_vertices = history(p)
+                    if i is None:
+                        found = forward_pure(graph, edges[rmpath[0]], min_label, used_vertices)
+                    else:
+                        found = forward_rmpath(graph, edges[rmpath[i]], min_label, used_vertices)
+                    for e in found:
+                        grown[(e[2], graph[0][e[1]])].append((0, e, p))
+                if grown:
+                    new_from = maxtoc if i is None else min_code[rmpath[i]][0]
+                    elabel, to_label = min(grown)
+                    new_entry = (new_from, maxtoc + 1, -1, elabel, to_label)
+                    projected = grown[(elabel, to_label)]
+                    break
+
+        if new_entry is None:
+            return True
+        if new_entry != code[len(min_code)]:
+            return False
+        min_code.append(new_entry)
+        if len(min_code) == len(code):
+            return True
+
+def grow(graphs, code, projected, min_support, found):
+    """Depth-first search of the DFS code tree below code, appending (code, support) to found."""
+    sup = support(projected)
+    if sup < min_support or not is_min(code):
+        return
+    found.append((tuple(code), sup))
+
+    rmpath = rightmost_path(code)
+    min_label = code[0][2]
+    maxtoc = code[rmpath[0]][1]
+    backward = defaultdict(list)
+    forward = defaultdict(list)
+    for p in projected:
+        graph = graphs[p[0]]
+        edges, used_edges, used_vertices = history(p)
+        for i in range(len(rmpath) - 1, 0, -1):
+            e = backward_edge(graph, edges[rmpath[i]], edges[rmpath[0]], used_edges)
+            if e is not None:
+                backward[(code[rmpath[i]][0], e[2])].append((p[0], e, p))
+        for e in forward_pure(graph, edges[rmpath[0]], min_label, used_vertices):
+            forward[(maxtoc, e[2], graph[0][e[1]])].append((p[0], e, p))
+        for i in rmpath:
+            for e in forward_rmpath(graph, edges[i], min_label, used_vertices):
+                forward[(code[i][0], e[2], graph[0][e[1]])].append((p[0], e, p))
+
+    # Children in DFS code order: backward edges by target vertex, then
+    # forward edges from the deepest rightmost-path vertex outwards
+    for to, elabel in sorted(backward):
+        code.append((maxtoc, to, -1, elabel, -1))
+        grow(graphs, code, backward[(to, elabel)], min_support, found)
+        code.pop()
+    for frm, elabel, to_label in sorted(forward, key=lambda k: (-k[0], k[1], k[2])):
+        code.append((frm, maxtoc + 1, -1, elabel, to_label))
+        grow(graphs, code, forward[(frm, elabel, to_label)], min_support, found)
+        code.pop()
+
+def mine_first_edge(graphs, first_edge, min_support):
+    found = []
+    projected = root_embeddings(graphs, first_edge)[first_edge]
+    grow(graphs, [(0, 1) + first_edge], projected, min_support, found)
+    return found
+
+# Worker state for the process pool: the graphs are shipped once per
+# worker at startup instead of with every task.
+_worker_graphs = None
+_worker_support = None
+
+def _init_worker(graphs, min_support):
+    global _worker_graphs, _worker_support
+    _worker_graphs = graphs
+    _worker_support = min_support
+
+def _mine_task(first_edge):
+    return mine_first_edge(_worker_graphs, first_edge, _worker_support)
+
+def mine(graphs, min_support, workers=1):
+    """
+    Frequent connected subgraphs with support >= min_support (graph count),
+    as ((label,), support) for single vertices followed by (DFS code,
+    support), grouped by first edge in ascending order.
+    """
+    vertex_support = defaultdict(set)
+    for gid, (labels, _) in enumerate(graphs):
+        for label in labels:
+            vertex_support[label].add(gid)
+    found = [((label,), len(gids)) for label, gids in sorted(vertex_support.items())
+             if len(gids) >= min_support]
+
+    roots = root_embeddings(graphs)
+    root_support = {key: support(projected) for key, projected in roots.items()}
+    del roots
+    frequent = [key for key in sorted(root_support) if root_support[key] >= min_support]
+    if workers <= 1 or len(frequent) <= 1:
+        for key in frequent:
+            found.extend(mine_first_edge(graphs, key, min_support))
+        return found
+
+    # Most frequent first edges tend to have the largest subtrees, so they
+    # are started first to keep the pool busy until the end
+    order = sorted(frequent, key=lambda k: -root_support[k])
+    with ProcessPoolExecutor(workers, initializer=_init_worker,
+                             initargs=(graphs, min_support)) as pool:
+        futures = {key: pool.submit(_mine_task, key) for key in order}
+        for key in frequent:
+            found.extend(futures[key].result())
+    return found
+
+def write_patterns(patterns, output_path):
+    """Writes patterns in the gSpan output format: 't # id * support', then v/e lines."""
+    with open(output_path, 'w', buffering=1 << 20) as f:
+        for pid, (code, sup) in enumerate(patterns):
+            lines = [f"t # {pid} * {sup}"]
+            if not isinstance(code[0], tuple):
+                lines.append(f"v 0 {code[0]}")
+            else:
+                labels, _ = code_graph(code)
+                lines.extend(f"v {v} {label}" for v, label in enumerate(labels))
+                lines.extend(f"e {frm} {to} {elabel}" for frm, to, _, elabel, _ in code)
+            f.write('\n'.join(lines) + '\n\n')
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Python gSpan: frequent connected subgraphs of a gSpan-format dataset")
+    parser.add_argument('dataset', help="Graph file with integer labels, e.g. runner.py's mapped output")
+    parser.add_argument('min_support', type=int, help="Minimum number of graphs containing a pattern")
+    parser.add_argument('output')
+    parser.add_argument('--workers', type=int, default=None,
+                        help="Processes mining first-edge subtrees (default: usable cores)")
+    args = parser.parse_args()
+
+    try:
+        graphs = build_graphs(parse_dataset_robust(args.dataset))
+    except (IOError, ValueError) as e:
+        print(f"Error reading {args.dataset}: {e}")
+        sys.exit(1)
+
+    workers = args.workers or len(os.sched_getaffinity(0))
+    patterns = mine(graphs, max(args.min_support, 1), workers)
+    write_patterns(patterns, args.output)
+    print(f"{len(patterns)} frequent patterns in {len(graphs)} graphs")
+
+if __name__ == "__main__":
+    main()
@@ -13,7 +13,8 @@ python3 runner.py \
     --fsg "$FSG_BIN" \
     --gaston "$GASTON_BIN" \
     --dataset "$DATASET" \
-    --outdir "$OUTPUT_DIR"
+    --outdir "$OUTPUT_DIR" \
+    "${@:6}"
 
 if [ $? -eq 0 ]; then
     echo "Mining complete. Generating plot..."
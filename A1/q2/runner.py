@@ -3,123 +3,478 @@ import time
 import argparse
 import os
 import sys
+import json
+import shutil
+import hashlib
+import queue
+import signal
+import tempfile
+import itertools
+import threading
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
 
-def parse_dataset_robust(filepath):
+# Bump whenever convert_dataset's output changes, so cached conversions
+# made by an older version are not reused
+CONVERTER_VERSION = 1
+GSPAN_INPUT = "dataset_gspan_gaston_mapped.txt"
+FSG_INPUT = "dataset_fsg.txt"
+LABEL_MAPS = "label_maps.json"
+PYGSPAN = os.path.join(os.path.dirname(os.path.abspath(__file__)), "pygspan.py")
+# Raw-label table next to the arrays of a binary graph directory
+BINARY_LABELS = "labels.json"
+
+def load_binary_dataset(dirpath):
     """
-    Parses various graph formats including Assignment PDF format.
+    Reads a binary graph directory (one .npy per CSR array, written by
+    save_binary_dataset or q3/graph_db.py) and yields the same graph dicts
+    parse_dataset_robust does, one graph at a time off the memory-mapped
+    arrays. Labels are translated back through BINARY_LABELS; ids missing
+    from it come back as the integer id, as a string.
     """
-    graphs = []
-    
-    with open(filepath, 'r') as f:
-        lines = [l.strip() for l in f if l.strip()]
+    def load(name):
+        return np.load(os.path.join(dirpath, name + '.npy'), mmap_mode='r')
 
-    if not lines:
-        print("Error: Dataset file is empty.")
-        sys.exit(1)
+    labels = load('node_labels')
+    node_offsets = load('node_offsets')
+    adj_offsets = load('adj_offsets')
+    adj_indices = load('adj_indices')
+    adj_labels = load('adj_labels')
+    node_names, edge_names = {}, {}
+    if os.path.exists(os.path.join(dirpath, BINARY_LABELS)):
+        with open(os.path.join(dirpath, BINARY_LABELS)) as f:
+            table = json.load(f)
+        node_names, edge_names = table['node'], table['edge']
 
-    is_standard = lines[0].startswith('t')
-    
-    if is_standard:
-        current_graph = None
-        for line in lines:
-            parts = line.split()
-            if line.startswith('t'):
-                if current_graph: graphs.append(current_graph)
-                gid = parts[2] if len(parts) > 2 else len(graphs)
-                current_graph = {'id': gid, 'nodes': [], 'edges': []}
-            elif line.startswith('v'):
-                if len(parts) >= 3:
-                    current_graph['nodes'].append(parts[2])
-            elif line.startswith('e') or line.startswith('u'):
-                if len(parts) >= 4:
-                    current_graph['edges'].append((parts[1], parts[2], parts[3]))
-        if current_graph: graphs.append(current_graph)
+    for g in range(len(node_offsets) - 1):
+        lo, hi = int(node_offsets[g]), int(node_offsets[g + 1])
+        offsets = np.asarray(adj_offsets[lo:hi + 1])
+        # Each undirected edge once, as (local u, local v, label)
+        src = np.repeat(np.arange(hi - lo), np.diff(offsets))
+        dst = np.asarray(adj_indices[offsets[0]:offsets[-1]]) - lo
+        once = src <= dst
+        edge_labels = adj_labels[offsets[0]:offsets[-1]][once].astype(str).tolist()
+        yield {'id': str(g), 'nodes': [node_names.get(l, l) for l in labels[lo:hi].astype(str).tolist()],
+               'edges': list(zip(src[once].astype(str).tolist(), dst[once].astype(str).tolist(),
+                                 [edge_names.get(l, l) for l in edge_labels]))}
 
-    else:
-        i = 0
-        while i < len(lines):
-            line = lines[i]
-            if line.startswith('#'):
-                graph_id = line.replace('#', '').strip()
-                current_graph = {'id': graph_id, 'nodes': [], 'edges': []}
-                graphs.append(current_graph)
-                i += 1
-                
-                if i >= len(lines): break
-                if lines[i].startswith('#'): continue 
-
-                try:
-                    num_nodes = int(lines[i])
-                    i += 1
-                    for _ in range(num_nodes):
-                        if i < len(lines):
-                            if lines[i].startswith('#'): break 
-                            current_graph['nodes'].append(lines[i])
-                            i += 1
-                    
-                    if i < len(lines) and not lines[i].startswith('#'):
-                        try:
-                            num_edges = int(lines[i])
-                            i += 1
-                            for _ in range(num_edges):
-                                if i < len(lines):
-                                    if lines[i].startswith('#'): break
-                                    edge_parts = lines[i].replace(',', ' ').split()
-                                    if len(edge_parts) >= 3:
-                                        current_graph['edges'].append(edge_parts[:3])
-                                    i += 1
-                        except ValueError: pass
-                except ValueError: pass
-            else:
-                i += 1
+def save_binary_dataset(graphs, dirpath):
+    """
+    Writes parse_dataset_robust's graph dicts as a binary graph directory:
+    the CSR arrays with labels numbered in first-seen order, plus
+    BINARY_LABELS mapping every id back to its raw label.
+    Returns (graphs, nodes) written; raises ValueError if no nodes were parsed.
+    """
+    node_ids, edge_ids = {}, {}
+    node_labels, node_offsets = array('q'), array('q', [0])
+    src, dst, edge_labels = array('q'), array('q'), array('q')
+    for g in graphs:
+        base = len(node_labels)
+        for label in g['nodes']:
+            node_labels.append(node_ids.setdefault(label, len(node_ids)))
+        for u, v, label in g['edges']:
+            u, v = int(u), int(v)
+            if not (0 <= u < len(g['nodes']) and 0 <= v < len(g['nodes'])):
+                raise ValueError(f"graph {g['id']}: edge {u}-{v} refers to a missing node")
+            src.append(base + u)
+            dst.append(base + v)
+            edge_labels.append(edge_ids.setdefault(label, len(edge_ids)))
+        node_offsets.append(len(node_labels))
+    if not node_labels:
+        raise ValueError("no nodes parsed")
 
-    return graphs
+    # Both directions of every edge, a self-loop once, each node's
+    # neighbours in file order
+    src, dst, edge_labels = (np.array(a, dtype=np.int64) for a in (src, dst, edge_labels))
+    loop = src == dst
+    rows = np.concatenate([src, dst[~loop]])
+    order = np.argsort(rows, kind='stable')
+    adj_offsets = np.zeros(len(node_labels) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=len(node_labels)), out=adj_offsets[1:])
+    label_dtype = np.int16 if max(len(node_ids), len(edge_ids)) <= np.iinfo(np.int16).max else np.int32
+    arrays = {
+        'node_labels': np.array(node_labels, dtype=label_dtype),
+        'node_offsets': np.array(node_offsets, dtype=np.int64),
+        'adj_offsets': adj_offsets,
+        'adj_indices': np.concatenate([dst, src[~loop]])[order],
+        'adj_labels': np.concatenate([edge_labels, edge_labels[~loop]])[order].astype(label_dtype),
+    }
 
-def write_gspan_format_with_mapping(graphs, output_path):
-    """Writes gSpan format with Integer mapping."""
-    node_label_map = {}
-    edge_label_map = {}
-    
-    def get_id(val, mapping):
-        if val not in mapping:
-            mapping[val] = len(mapping)
-        return mapping[val]
+    os.makedirs(dirpath, exist_ok=True)
+    for name, values in arrays.items():
+        np.save(os.path.join(dirpath, name + '.npy'), values)
+    with open(os.path.join(dirpath, BINARY_LABELS), 'w') as f:
+        json.dump({'node': {str(i): raw for raw, i in node_ids.items()},
+                   'edge': {str(i): raw for raw, i in edge_ids.items()}}, f)
+    return len(node_offsets) - 1, len(node_labels)
 
-    with open(output_path, 'w') as f:
-        for idx, g in enumerate(graphs):
-            if not g['nodes'] and not g['edges']: continue
-            
-            f.write(f"t # {idx}\n")
-            for nid, label in enumerate(g['nodes']):
-                f.write(f"v {nid} {get_id(label, node_label_map)}\n")
-            for u, v, l in g['edges']:
-                f.write(f"e {u} {v} {get_id(l, edge_label_map)}\n")
-
-def write_fsg_format_with_mapping(graphs, output_path):
-    """Writes FSG format with Integer mapping."""
+def _nonblank_lines(f):
+    for line in f:
+        line = line.strip()
+        if line:
+            yield line
+
+def _standard_graphs(lines):
+    """'t # id' / 'v id label' / 'e u v label' (or 'u ...') records."""
+    current_graph = None
+    seen = 0
+    for line in lines:
+        parts = line.split()
+        if line.startswith('t'):
+            if current_graph: yield current_graph
+            gid = parts[2] if len(parts) > 2 else seen
+            seen += 1
+            current_graph = {'id': gid, 'nodes': [], 'edges': []}
+        elif current_graph is None:
+            continue
+        elif line.startswith('v'):
+            if len(parts) >= 3:
+                current_graph['nodes'].append(parts[2])
+        elif line.startswith('e') or line.startswith('u'):
+            if len(parts) >= 4:
+                current_graph['edges'].append((parts[1], parts[2], parts[3]))
+    if current_graph: yield current_graph
+
+def _take_counted(lines, line, count, take):
+    """Passes up to count lines to take, stopping early at a '#' header; returns the next line."""
+    for _ in range(count):
+        if line is None or line.startswith('#'):
+            break
+        take(line)
+        line = next(lines, None)
+    return line
+
+def _block_graphs(lines):
+    """Assignment PDF format: '#id', node count, node labels, edge count, 'u, v, label' lines."""
+    def add_edge(graph, line):
+        edge_parts = line.replace(',', ' ').split()
+        if len(edge_parts) >= 3:
+            graph['edges'].append(edge_parts[:3])
+
+    line = next(lines, None)
+    while line is not None:
+        if not line.startswith('#'):
+            line = next(lines, None)
+            continue
+        graph = {'id': line.replace('#', '').strip(), 'nodes': [], 'edges': []}
+        line = next(lines, None)
+        # A count that does not parse leaves its line to be skipped as stray text
+        try:
+            if line is not None and not line.startswith('#'):
+                num_nodes = int(line)
+                line = _take_counted(lines, next(lines, None), num_nodes, graph['nodes'].append)
+                if line is not None and not line.startswith('#'):
+                    num_edges = int(line)
+                    line = _take_counted(lines, next(lines, None), num_edges,
+                                         lambda l: add_edge(graph, l))
+        except ValueError: pass
+        yield graph
+
+def parse_dataset_robust(filepath):
+    """
+    Yields the graphs of a dataset one at a time, as {'id', 'nodes',
+    'edges'} dicts. Parses various graph formats including Assignment PDF
+    format, or reads a binary graph directory (see load_binary_dataset).
+    Only the current graph is held in memory.
+    """
+    if os.path.isdir(filepath):
+        yield from load_binary_dataset(filepath)
+        return
+
+    with open(filepath, 'r') as f:
+        lines = _nonblank_lines(f)
+        first = next(lines, None)
+        if first is None:
+            print("Error: Dataset file is empty.")
+            sys.exit(1)
+
+        lines = itertools.chain([first], lines)
+        if first.startswith('t'):
+            yield from _standard_graphs(lines)
+        else:
+            yield from _block_graphs(lines)
+
+def convert_dataset(graphs, gspan_path, fsg_path, buffer_bytes=1 << 20):
+    """
+    Writes the gSpan/Gaston and FSG input files in a single pass over
+    graphs, skipping empty ones. Graphs are renumbered from 0 and labels
+    mapped to integers in first-seen order, identically in both files.
+    Returns the number of graphs written and the {'node', 'edge'} label maps.
+    """
     node_label_map = {}
     edge_label_map = {}
-    
+
     def get_id(val, mapping):
         if val not in mapping:
             mapping[val] = len(mapping)
         return mapping[val]
 
-    with open(output_path, 'w') as f:
-        valid_count = 0
-        for idx, g in enumerate(graphs):
+    count = 0
+    with open(gspan_path, 'w', buffering=buffer_bytes) as gspan_file, \
+            open(fsg_path, 'w', buffering=buffer_bytes) as fsg_file:
+        for g in graphs:
             if not g['nodes'] and not g['edges']: continue
-            
-            f.write(f"t # {valid_count}\n")
-            valid_count += 1
-            
-            for nid, label in enumerate(g['nodes']):
-                f.write(f"v {nid} {get_id(label, node_label_map)}\n")
-            
-            for u, v, l in g['edges']:
-                f.write(f"u {u} {v} {get_id(l, edge_label_map)}\n")
-
-def run_mining(binary, dataset, support_pct, output_file, algorithm, total_graphs):
+
+            head = f"t # {count}\n" + ''.join(f"v {nid} {get_id(label, node_label_map)}\n"
+                                              for nid, label in enumerate(g['nodes']))
+            edges = [(u, v, get_id(l, edge_label_map)) for u, v, l in g['edges']]
+            gspan_file.write(head + ''.join(f"e {u} {v} {l}\n" for u, v, l in edges))
+            fsg_file.write(head + ''.join(f"u {u} {v} {l}\n" for u, v, l in edges))
+            count += 1
+    return count, {'node': node_label_map, 'edge': edge_label_map}
+
+def write_conversion(dataset, dirpath):
+    """Converts dataset into the miner inputs and LABEL_MAPS in dirpath; returns the graph count."""
+    for name in (GSPAN_INPUT, FSG_INPUT, LABEL_MAPS):
+        # May be hard links into the conversion cache, which must not be overwritten
+        if os.path.lexists(os.path.join(dirpath, name)):
+            os.remove(os.path.join(dirpath, name))
+    count, label_maps = convert_dataset(parse_dataset_robust(dataset),
+                                        os.path.join(dirpath, GSPAN_INPUT),
+                                        os.path.join(dirpath, FSG_INPUT))
+    with open(os.path.join(dirpath, LABEL_MAPS), 'w') as f:
+        json.dump(label_maps, f)
+    return count
+
+def dataset_digest(path, chunk_bytes=1 << 20):
+    """
+    BLAKE2b of the dataset bytes and CONVERTER_VERSION. A binary graph
+    directory is hashed file by file, names included, in sorted order.
+    """
+    h = hashlib.blake2b(digest_size=16)
+    h.update(f"converter {CONVERTER_VERSION}\n".encode())
+    if os.path.isdir(path):
+        files = sorted(n for n in os.listdir(path) if os.path.isfile(os.path.join(path, n)))
+    else:
+        files = [None]
+    for name in files:
+        if name is not None:
+            h.update(name.encode() + b'\0')
+        with open(path if name is None else os.path.join(path, name), 'rb') as f:
+            for chunk in iter(lambda: f.read(chunk_bytes), b''):
+                h.update(chunk)
+    return h.hexdigest()
+
+def cached_conversion(dataset, cache_dir):
+    """
+    Returns (entry directory, graph count, hit) for the converted miner
+    inputs of dataset, converting only when the cache has no entry for its
+    digest. An entry is built under a temporary name and renamed into
+    place, so an interrupted conversion never leaves a partial one.
+    """
+    entry = os.path.join(cache_dir, dataset_digest(dataset))
+    meta_path = os.path.join(entry, 'meta.json')
+    if os.path.exists(meta_path):
+        with open(meta_path, 'r') as f:
+            return entry, json.load(f)['graphs'], True
+
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp = tempfile.mkdtemp(prefix='.partial-', dir=cache_dir)
+    try:
+        os.chmod(tmp, 0o755)
+        count = write_conversion(dataset, tmp)
+        with open(os.path.join(tmp, 'meta.json'), 'w') as f:
+            json.dump({'graphs': count, 'converter': CONVERTER_VERSION,
+                       'source': os.path.abspath(dataset)}, f)
+        try:
+            os.rename(tmp, entry)
+        except OSError:
+            # Another session stored the same entry first; theirs is as good
+            if not os.path.exists(meta_path):
+                raise
+    finally:
+        if os.path.exists(tmp):
+            shutil.rmtree(tmp)
+    return entry, count, False
+
+def link_or_copy(src, dst):
+    if os.path.lexists(dst):
+        os.remove(dst)
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copyfile(src, dst)
+
+def rss_kb(pid):
+    """Current resident set size of pid from /proc, 0 if unavailable."""
+    try:
+        with open(f'/proc/{pid}/status', 'r') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1])
+    except (OSError, ValueError):
+        pass
+    return 0
+
+def process_tree(pid):
+    """pid followed by all of its live descendants, from /proc/<pid>/task/*/children."""
+    tree, stack = [], [pid]
+    while stack:
+        p = stack.pop()
+        tree.append(p)
+        try:
+            for task in os.listdir(f'/proc/{p}/task'):
+                with open(f'/proc/{p}/task/{task}/children', 'r') as f:
+                    stack.extend(int(c) for c in f.read().split())
+        except (OSError, ValueError):
+            pass
+    return tree
+
+def watch_budget(proc, pidfd, start, timeout, mem_limit_kb, done, exceeded, interval=0.01):
+    """
+    Kills proc and its descendants once it runs past timeout seconds or the
+    RSS summed over the whole process tree passes mem_limit_kb (pages shared
+    between forked workers count once per process), recording which budget
+    it blew in exceeded. proc itself is killed through a pidfd when there is
+    one, so that kill can never reach a recycled pid.
+    """
+    while not done.wait(interval):
+        tree = process_tree(proc.pid)
+        if timeout is not None and time.perf_counter() - start > timeout:
+            exceeded.append('timeout')
+        elif mem_limit_kb is not None and sum(rss_kb(p) for p in tree) > mem_limit_kb:
+            exceeded.append('memory')
+        else:
+            continue
+        # Descendants first, so none of them outlives its parent as an orphan
+        for p in reversed(tree[1:]):
+            try:
+                os.kill(p, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+        try:
+            if pidfd is not None:
+                signal.pidfd_send_signal(pidfd, signal.SIGKILL)
+            else:
+                os.kill(proc.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+        return
+
+def run_pinned(cmd, cpu, stdout, timeout=None, mem_limit_kb=None):
+    """
+    Runs cmd to completion, bound to one core if cpu is given, and returns
+    (wall seconds, rusage, exceeded). Wall time is on the monotonic clock;
+    rusage is the child's own, from wait4. With a timeout or memory limit
+    the child is killed when it passes one and exceeded names it ('timeout'
+    or 'memory'), otherwise exceeded is None. Raises CalledProcessError on
+    any other failure.
+    The binding is applied right after the fork, so only the first instants
+    of the child may run elsewhere (preexec_fn is unsafe with threads).
+    """
+    with tempfile.TemporaryFile() as err:
+        start = time.perf_counter()
+        proc = subprocess.Popen(cmd, stdout=stdout, stderr=err)
+        if cpu is not None:
+            try:
+                os.sched_setaffinity(proc.pid, {cpu})
+            except (AttributeError, OSError):
+                pass
+
+        exceeded = []
+        done = threading.Event()
+        watcher = pidfd = None
+        if timeout is not None or mem_limit_kb is not None:
+            try:
+                pidfd = os.pidfd_open(proc.pid)
+            except (AttributeError, OSError):
+                pass
+            watcher = threading.Thread(target=watch_budget, daemon=True,
+                                       args=(proc, pidfd, start, timeout, mem_limit_kb,
+                                             done, exceeded))
+            watcher.start()
+
+        _, status, usage = os.wait4(proc.pid, 0)
+        wall = time.perf_counter() - start
+        done.set()
+        if watcher is not None:
+            watcher.join()
+        if pidfd is not None:
+            os.close(pidfd)
+
+        proc.returncode = os.waitstatus_to_exitcode(status)
+        if exceeded:
+            return wall, usage, exceeded[0]
+        if proc.returncode:
+            err.seek(0)
+            raise subprocess.CalledProcessError(proc.returncode, cmd, None, err.read())
+    return wall, usage, None
+
+def count_patterns(paths):
+    """Patterns in the first non-empty file among paths, one 't' header line each."""
+    for path in paths:
+        if os.path.isfile(path) and os.path.getsize(path):
+            with open(path, 'r', errors='replace') as f:
+                return sum(1 for line in f if line.startswith('t'))
+    return None
+
+def summarize_trials(trials):
+    """Median and interquartile range of the timed trials, plus their CPU time and peak RSS."""
+    wall = np.array([t['wall_s'] for t in trials])
+    q1, median, q3 = np.percentile(wall, [25, 50, 75])
+    return {
+        'status': 'ok',
+        'wall_median_s': float(median),
+        'wall_q1_s': float(q1),
+        'wall_q3_s': float(q3),
+        'wall_iqr_s': float(q3 - q1),
+        'user_median_s': float(np.median([t['user_s'] for t in trials])),
+        'sys_median_s': float(np.median([t['sys_s'] for t in trials])),
+        'max_rss_kb': max(t['max_rss_kb'] for t in trials),
+        'patterns': trials[-1]['patterns'],
+        'trials': trials,
+    }
+
+def usable_cpus():
+    try:
+        return sorted(os.sched_getaffinity(0))
+    except AttributeError:
+        return list(range(os.cpu_count() or 1))
+
+def concurrency_cap(jobs, mem_per_job_mb=None):
+    """At most one job per usable core and, if given, per mem_per_job_mb of free memory."""
+    cap = min(jobs, len(usable_cpus()))
+    if mem_per_job_mb:
+        try:
+            free = os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_AVPHYS_PAGES')
+            cap = min(cap, free // (mem_per_job_mb << 20))
+        except (ValueError, OSError):
+            pass
+    return max(cap, 1)
+
+def run_jobs(jobs, run_job, workers):
+    """
+    Calls run_job(job, cpu) for every job and returns {job: result}. With
+    workers > 1, up to that many jobs run at once, each holding its own core
+    (cpu) for its whole run; otherwise they run one by one with cpu None.
+    """
+    if workers <= 1:
+        return {job: run_job(job, None) for job in jobs}
+
+    free = queue.Queue()
+    for cpu in usable_cpus()[:workers]:
+        free.put(cpu)
+
+    def task(job):
+        cpu = free.get()
+        try:
+            return run_job(job, cpu)
+        finally:
+            free.put(cpu)
+
+    with ThreadPoolExecutor(workers) as pool:
+        return dict(zip(jobs, pool.map(task, jobs)))
+
+def run_mining(binary, dataset, support_pct, output_file, algorithm, total_graphs, cpu=None,
+               trials=1, warmup=0, timeout=None, mem_limit_mb=None):
+    """
+    Runs one miner warmup + trials times and returns summarize_trials() of
+    the timed trials, {'status': 'failed', ...} if any run fails, or
+    {'status': 'censored', ...} if one is killed for exceeding the timeout
+    or memory budget; its runtime is then only known to exceed the limit.
+    """
+    mem_limit_kb = None if mem_limit_mb is None else mem_limit_mb << 10
     abs_support = int((support_pct / 100.0) * total_graphs)
     if abs_support == 0: abs_support = 1
     
@@ -127,32 +482,70 @@ def run_mining(binary, dataset, support_pct, output_file, algorithm, total_graph
     if algorithm == 'gspan':
         s_val = support_pct / 100.0
         cmd = [binary, '-f', dataset, '-s', str(s_val), '-o', output_file]
+        pattern_files = [output_file, dataset + '.fp']
     elif algorithm == 'fsg':
         cmd = [binary, '-s', str(support_pct), dataset]
+        pattern_files = [os.path.splitext(dataset)[0] + '.fp', dataset + '.fp']
     elif algorithm == 'gaston':
         cmd = [binary, str(abs_support), dataset, output_file]
+        pattern_files = [output_file]
+    elif algorithm == 'pygspan':
+        cmd = [sys.executable, binary, dataset, str(abs_support), output_file]
+        pattern_files = [output_file]
 
     print(f"Running {algorithm} at {support_pct}%...")
     
-    start_time = time.time()
-    try:
-        if algorithm == 'fsg':
-            with open(output_file, 'w') as outfile:
-                subprocess.run(cmd, stdout=outfile, stderr=subprocess.PIPE, check=True)
+    timed = []
+    for run in range(warmup + trials):
+        try:
+            if algorithm == 'fsg':
+                with open(output_file, 'w') as outfile:
+                    wall, usage, exceeded = run_pinned(cmd, cpu, outfile, timeout, mem_limit_kb)
+            else:
+                wall, usage, exceeded = run_pinned(cmd, cpu, subprocess.DEVNULL, timeout,
+                                                   mem_limit_kb)
+        except subprocess.CalledProcessError as e:
+            print(f"Error running {algorithm}: {e}")
+            if e.stderr:
+                print(f"  STDERR: {e.stderr.decode(errors='replace').strip()}")
+            open(output_file, 'a').close() 
+            return {'status': 'failed', 'error': str(e), 'trials': timed}
+        except Exception as e:
+            print(f"Execution failed: {e}")
+            return {'status': 'failed', 'error': str(e), 'trials': timed}
+
+        if exceeded:
+            limit = f"{timeout}s" if exceeded == 'timeout' else f"{mem_limit_mb} MB"
+            print(f"  {algorithm} at {support_pct}% exceeded the {exceeded} budget ({limit})")
+            return {'status': 'censored', 'reason': exceeded, 'wall_lower_bound_s': wall,
+                    'max_rss_kb': usage.ru_maxrss, 'trials': timed}
+        if run >= warmup:
+            timed.append({'wall_s': wall, 'user_s': usage.ru_utime, 'sys_s': usage.ru_stime,
+                          'max_rss_kb': usage.ru_maxrss,
+                          'patterns': count_patterns(pattern_files)})
+
+    return summarize_trials(timed)
+
+def bisect_support(run, target_s, lo, hi, steps):
+    """
+    Finds the support (in percent) at which a miner's runtime crosses
+    target_s by bisection on [lo, hi], relying on runtime only growing as
+    support drops. run(support) returns a run_mining result; anything but an
+    'ok' run within target_s counts as over target. threshold_support is the
+    lowest probed support that finished within target_s (None if none did).
+    """
+    probes = []
+    threshold = None
+    for _ in range(steps):
+        mid = round((lo + hi) / 2.0, 2)
+        result = run(mid)
+        within = result['status'] == 'ok' and result['wall_median_s'] <= target_s
+        probes.append({'support': mid, 'within_target': within, 'result': result})
+        if within:
+            hi = threshold = mid
         else:
-            subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
-    except subprocess.CalledProcessError as e:
-        print(f"Error running {algorithm}: {e}")
-        if e.stderr:
-            print(f"  STDERR: {e.stderr.decode().strip()}")
-        open(output_file, 'a').close() 
-        return 0.0
-    except Exception as e:
-        print(f"Execution failed: {e}")
-        return 0.0
-
-    end_time = time.time()
-    return end_time - start_time
+            lo = mid
+    return {'target_s': target_s, 'threshold_support': threshold, 'probes': probes}
 
 def main():
     parser = argparse.ArgumentParser()
@@ -161,53 +554,166 @@ def main():
     parser.add_argument('--gaston', required=True)
     parser.add_argument('--dataset', required=True)
     parser.add_argument('--outdir', required=True)
+    parser.add_argument('--no-pygspan', action='store_true',
+                        help="Leave the Python gSpan baseline (pygspan.py) out of the sweep")
+    parser.add_argument('--jobs', type=int, default=1,
+                        help="Run up to this many (miner, support) jobs at once, each pinned to its "
+                             "own core; 1 keeps the serial sweep")
+    parser.add_argument('--mem-per-job-mb', type=int, default=None,
+                        help="Expected peak memory of one job; lowers --jobs to what free memory allows")
+    parser.add_argument('--trials', type=int, default=3,
+                        help="Timed runs per (miner, support); the median and IQR are reported")
+    parser.add_argument('--warmup', type=int, default=1,
+                        help="Untimed runs before the trials, to warm the page cache")
+    parser.add_argument('--timeout', type=float, default=None,
+                        help="Per-run time budget in seconds; a miner over it skips its lower supports")
+    parser.add_argument('--mem-limit-mb', type=int, default=None,
+                        help="Per-run peak RSS budget; a miner over it skips its lower supports")
+    parser.add_argument('--adaptive-target', type=float, default=None, metavar='SECONDS',
+                        help="Instead of the fixed sweep, bisect support for the point where each "
+                             "miner's runtime crosses SECONDS")
+    parser.add_argument('--adaptive-range', type=float, nargs=2, default=(1.0, 95.0),
+                        metavar=('LO', 'HI'), help="Support range searched by --adaptive-target")
+    parser.add_argument('--adaptive-steps', type=int, default=6)
+    parser.add_argument('--cache-dir', default=None,
+                        help="Cache of converted datasets, keyed by content hash "
+                             "(default: <outdir>/dataset_cache)")
+    parser.add_argument('--no-cache', action='store_true',
+                        help="Always convert the dataset, bypassing the cache")
     args = parser.parse_args()
+    if args.trials < 1:
+        parser.error("--trials must be at least 1")
+    if args.warmup < 0:
+        parser.error("--warmup cannot be negative")
 
-    print(f"Parsing dataset: {args.dataset}")
-    graphs = parse_dataset_robust(args.dataset)
-    
-    valid_graphs = [g for g in graphs if g['nodes'] or g['edges']]
-    total_graphs = len(valid_graphs)
+    gspan_data_path = os.path.join(args.outdir, GSPAN_INPUT)
+    fsg_data_path = os.path.join(args.outdir, FSG_INPUT)
+
+    if args.no_cache:
+        print(f"Parsing dataset: {args.dataset}")
+        total_graphs = write_conversion(args.dataset, args.outdir)
+    else:
+        cache_dir = args.cache_dir or os.path.join(args.outdir, "dataset_cache")
+        try:
+            entry, total_graphs, hit = cached_conversion(args.dataset, cache_dir)
+        except OSError as e:
+            print(f"Error converting dataset: {e}")
+            sys.exit(1)
+        print(f"{'Reusing cached conversion of' if hit else 'Parsed and cached'} "
+              f"{args.dataset} ({entry})")
+        for name in (GSPAN_INPUT, FSG_INPUT, LABEL_MAPS):
+            link_or_copy(os.path.join(entry, name), os.path.join(args.outdir, name))
     print(f"Total valid graphs loaded: {total_graphs}")
     
     if total_graphs == 0:
         print("Error: No valid graphs found.")
         sys.exit(1)
 
-    gspan_data_path = os.path.join(args.outdir, "dataset_gspan_gaston_mapped.txt")
-    fsg_data_path = os.path.join(args.outdir, "dataset_fsg.txt")
-    
-    write_gspan_format_with_mapping(valid_graphs, gspan_data_path)
-    write_fsg_format_with_mapping(valid_graphs, fsg_data_path)
-
     supports = [95, 50, 25, 10, 5]
-    results = {sup: {'gspan': 0, 'fsg': 0, 'gaston': 0} for sup in supports}
-
-    for sup in supports:
-        print(f"\n--- SUPPORT: {sup}% ---")
-        
-        # Run gSpan
-        out_name = os.path.join(args.outdir, f"gspan{sup}")
-        t = run_mining(args.gspan, gspan_data_path, sup, out_name, 'gspan', total_graphs)
-        results[sup]['gspan'] = t
-
-        # Run FSG
-        out_name = os.path.join(args.outdir, f"fsg{sup}")
-        t = run_mining(args.fsg, fsg_data_path, sup, out_name, 'fsg', total_graphs)
-        results[sup]['fsg'] = t
-
-        # Run Gaston
-        out_name = os.path.join(args.outdir, f"gaston{sup}")
-        t = run_mining(args.gaston, gspan_data_path, sup, out_name, 'gaston', total_graphs)
-        results[sup]['gaston'] = t
-
-    # Save results
+    results = {sup: {} for sup in supports}
+    binaries = {'gspan': args.gspan, 'fsg': args.fsg, 'gaston': args.gaston}
+    inputs = {'gspan': gspan_data_path, 'fsg': fsg_data_path, 'gaston': gspan_data_path}
+    if not args.no_pygspan:
+        binaries['pygspan'] = PYGSPAN
+        inputs['pygspan'] = gspan_data_path
+
+    workers = concurrency_cap(args.jobs, args.mem_per_job_mb)
+    if workers > 1:
+        print(f"\nRunning {len(binaries) * len(supports)} jobs, {workers} at a time on separate cores")
+
+    def mine(algo, sup, cpu, timeout):
+        out_name = os.path.join(args.outdir, f"{algo}{sup}")
+        if cpu is None:
+            return run_mining(binaries[algo], inputs[algo], sup, out_name, algo, total_graphs,
+                              trials=args.trials, warmup=args.warmup, timeout=timeout,
+                              mem_limit_mb=args.mem_limit_mb)
+
+        # Some miners write <input>.fp next to their input; a per-job link
+        # keeps concurrent runs from writing the same file
+        link = os.path.join(args.outdir, f"{algo}{sup}_input.txt")
+        if os.path.lexists(link):
+            os.remove(link)
+        os.symlink(os.path.abspath(inputs[algo]), link)
+        try:
+            return run_mining(binaries[algo], link, sup, out_name, algo, total_graphs, cpu,
+                              args.trials, args.warmup, timeout, args.mem_limit_mb)
+        finally:
+            os.remove(link)
+
+    if args.adaptive_target is not None:
+        # A probe only has to show whether it beats the target, so it is
+        # stopped shortly after the target instead of the full timeout
+        target = args.adaptive_target
+        timeout = min(args.timeout or float('inf'), 1.05 * target)
+        lo, hi = args.adaptive_range
+
+        def search(algo, cpu):
+            return bisect_support(lambda sup: mine(algo, sup, cpu, timeout), target, lo, hi,
+                                  args.adaptive_steps)
+
+        found = run_jobs(list(binaries), search, min(workers, len(binaries)))
+        with open(os.path.join(args.outdir, "adaptive_results.json"), "w") as f:
+            json.dump(found, f, indent=2)
+        for algo, res in found.items():
+            where = f"{res['threshold_support']}%" if res['threshold_support'] is not None else \
+                f"none of the probed supports (all above {target}s)"
+            print(f"{algo}: finishes within {target}s down to {where}")
+        return
+
+    # Runtime grows as support drops, so once a miner blows a budget at
+    # some support every lower support is skipped and recorded as censored
+    over_budget = {}
+    lock = threading.Lock()
+
+    def run_job(job, cpu):
+        sup, algo = job
+        with lock:
+            above = over_budget.get(algo)
+        if above is not None and sup < above:
+            print(f"Skipping {algo} at {sup}%: over budget at {above}%")
+            return {'status': 'censored', 'reason': 'skipped', 'over_budget_at': above}
+        if cpu is None and algo == 'gspan':
+            print(f"\n--- SUPPORT: {sup}% ---")
+        result = mine(algo, sup, cpu, args.timeout)
+        if result['status'] == 'censored':
+            with lock:
+                over_budget[algo] = max(over_budget.get(algo, sup), sup)
+        return result
+
+    if workers > 1 and (args.timeout is not None or args.mem_limit_mb is not None):
+        # Concurrent jobs of one miner would start its lowest supports before
+        # a higher one could blow the budget, so each miner becomes a single
+        # job running its supports highest first and the skip takes effect
+        def run_chain(algo, cpu):
+            return {sup: run_job((sup, algo), cpu) for sup in sorted(supports, reverse=True)}
+
+        for algo, by_support in run_jobs(list(binaries), run_chain,
+                                         min(workers, len(binaries))).items():
+            for sup, t in by_support.items():
+                results[sup][algo] = t
+    else:
+        jobs = [(sup, algo) for sup in supports for algo in binaries]
+        for (sup, algo), t in run_jobs(jobs, run_job, workers).items():
+            results[sup][algo] = t
+
+    # Save results: medians in the plain text file (nan for failed or censored runs),
+    # every trial and its statistics in the JSON one
     sorted_supports = sorted(supports)
+    names = {'gspan': 'gSpan', 'fsg': 'FSG', 'gaston': 'Gaston', 'pygspan': 'PyGSpan'}
+    names = {algo: names[algo] for algo in binaries}
+
+    def median(s, algo):
+        return str(results[s][algo].get('wall_median_s', float('nan')))
+
     with open(os.path.join(args.outdir, "timing_results.txt"), "w") as f:
         f.write(f"Supports: {','.join(map(str, sorted_supports))}\n")
-        f.write(f"gSpan: {','.join([str(results[s]['gspan']) for s in sorted_supports])}\n")
-        f.write(f"FSG: {','.join([str(results[s]['fsg']) for s in sorted_supports])}\n")
-        f.write(f"Gaston: {','.join([str(results[s]['gaston']) for s in sorted_supports])}\n")
+        for algo, name in names.items():
+            f.write(f"{name}: {','.join([median(s, algo) for s in sorted_supports])}\n")
+
+    with open(os.path.join(args.outdir, "timing_results.json"), "w") as f:
+        json.dump({'supports': sorted_supports, 'trials': args.trials, 'warmup': args.warmup,
+                   'results': {name: {str(s): results[s][algo] for s in sorted_supports}
+                               for algo, name in names.items()}}, f, indent=2)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,23 @@
+import sys
+import argparse
+
+from runner import parse_dataset_robust, save_binary_dataset
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Convert a dataset runner.py reads (standard or block format) "
+                    "to a binary graph directory")
+    parser.add_argument('input_path')
+    parser.add_argument('output_dir')
+    args = parser.parse_args()
+
+    try:
+        num_graphs, num_nodes = save_binary_dataset(parse_dataset_robust(args.input_path),
+                                                    args.output_dir)
+    except (IOError, ValueError) as e:
+        print(f"Error converting {args.input_path}: {e}")
+        sys.exit(1)
+    print(f"Wrote {num_graphs} graphs ({num_nodes} nodes) to {args.output_dir}")
+
+if __name__ == "__main__":
+    main()
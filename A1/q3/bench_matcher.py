@@ -0,0 +1,58 @@
+import sys
+import time
+import argparse
+import numpy as np
+
+import small_matcher
+from convert import parse_graph_file, vf2_contains
+
+def time_engine(graphs, patterns, contains):
+    """Runs every (graph, pattern) test; returns the 0/1 matrix and seconds taken."""
+    result = np.zeros((len(graphs), len(patterns)), dtype=np.int8)
+    start = time.perf_counter()
+    for i, graph in enumerate(graphs):
+        for j, pattern in enumerate(patterns):
+            if contains(graph, pattern):
+                result[i, j] = 1
+    return result, time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark the small-pattern matcher against networkx VF2 and check they agree")
+    parser.add_argument('dataset_path')
+    parser.add_argument('subgraphs_path')
+    parser.add_argument('--limit', type=int, default=None,
+                        help="Only use the first N database graphs")
+    args = parser.parse_args()
+
+    db = parse_graph_file(args.dataset_path, is_gspan_format=False)
+    subgraphs = parse_graph_file(args.subgraphs_path, is_gspan_format=True)
+    if args.limit is not None:
+        db = db[:args.limit]
+
+    # Both engines get their inputs built outside the timed region
+    nx_graphs = list(db)
+    nx_patterns = list(subgraphs)
+    label_freq = small_matcher.label_frequencies(db)
+    small_graphs = [small_matcher.prepare_graph(db, g) for g in range(len(db))]
+    small_patterns = small_matcher.prepare_patterns(subgraphs, label_freq)
+
+    pairs = len(db) * len(subgraphs)
+    print(f"Matching {len(db)} graphs against {len(subgraphs)} subgraphs ({pairs} pairs)")
+
+    vf2_result, vf2_time = time_engine(nx_graphs, nx_patterns, vf2_contains)
+    print(f"networkx VF2: {vf2_time:.3f}s ({pairs / max(vf2_time, 1e-9):.0f} pairs/s)")
+
+    small_result, small_time = time_engine(small_graphs, small_patterns, small_matcher.contains)
+    print(f"small matcher: {small_time:.3f}s ({pairs / max(small_time, 1e-9):.0f} pairs/s)")
+    print(f"Speedup: {vf2_time / max(small_time, 1e-9):.1f}x")
+
+    mismatches = np.argwhere(vf2_result != small_result)
+    if len(mismatches):
+        print(f"MISMATCH: {len(mismatches)} pairs disagree, e.g. (graph, subgraph) = "
+              f"{[tuple(m) for m in mismatches[:10].tolist()]}")
+        sys.exit(1)
+    print(f"Cross-check passed: both engines agree on all {pairs} pairs")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+import time
+import argparse
+import numpy as np
+
+from graph_db import graph_db_from_networkx
+from convert import parse_graph_file, generate_features
+from generate_candidates import candidate_blocks, prepare_operands, block_sizes
+from simple_miner import mine_features, mine_tree_features
+
+def mean_candidates(db_feats, query_feats):
+    db, queries = prepare_operands(db_feats, query_feats, 'compare')
+    query_block, db_block = block_sizes(len(db), db.shape[1], 'compare', 64 << 20)
+    sizes = [len(c) for _, lists in candidate_blocks(db, queries, 'compare', query_block, db_block,
+                                                     64 << 20)
+             for c in lists]
+    return float(np.mean(sizes)) if sizes else 0.0
+
+def evaluate(name, mine, db, queries):
+    start = time.perf_counter()
+    features = graph_db_from_networkx(mine())
+    mine_time = time.perf_counter() - start
+
+    db_feats = generate_features(db, features, matcher='small')
+    query_feats = generate_features(queries, features, matcher='small')
+    candidates = mean_candidates(db_feats, query_feats)
+    print(f"\n{name}: {len(features)} features mined in {mine_time:.2f}s, "
+          f"{candidates:.1f} candidates per query on average")
+    return mine_time, candidates
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare the single-edge and tree miners by filtering power on a query workload")
+    parser.add_argument('dataset_path')
+    parser.add_argument('query_path')
+    parser.add_argument('--top-k', type=int, default=50)
+    parser.add_argument('--max-edges', type=int, default=4)
+    parser.add_argument('--min-support', type=float, default=0.1)
+    args = parser.parse_args()
+
+    db = parse_graph_file(args.dataset_path, is_gspan_format=False)
+    queries = parse_graph_file(args.query_path, is_gspan_format=False)
+
+    edge_time, edge_cands = evaluate(
+        "single edges", lambda: mine_features(db, top_k=args.top_k), db, queries)
+    tree_time, tree_cands = evaluate(
+        f"trees <= {args.max_edges} edges",
+        lambda: mine_tree_features(db, args.top_k, args.min_support, args.max_edges), db, queries)
+
+    extra = tree_time - edge_time
+    saved = edge_cands - tree_cands
+    print(f"\nCandidate set: {edge_cands:.1f} -> {tree_cands:.1f} per query "
+          f"({100.0 * saved / max(edge_cands, 1e-9):.1f}% smaller) for {extra:.2f}s extra mining")
+    if extra > 0:
+        print(f"That is {saved / extra:.1f} fewer candidates per query per extra second of mining")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+import sys
+import time
+import asyncio
+import argparse
+import numpy as np
+
+from feature_bits import PackedFeatures, load_features
+from candidate_server import encode_request, read_response
+
+async def run_connection(open_connection, rows, order, latencies, rejected):
+    """Sends this connection's share of queries one at a time, timing each round trip."""
+    reader, writer = await open_connection()
+    try:
+        for q in order:
+            start = time.perf_counter()
+            writer.write(encode_request(rows[q]))
+            await writer.drain()
+            ids = await read_response(reader)
+            latencies.append(time.perf_counter() - start)
+            if ids is None:
+                rejected.append(q)
+    finally:
+        writer.close()
+
+async def run_load(open_connection, rows, requests, connections, seed):
+    rng = np.random.default_rng(seed)
+    picks = rng.integers(0, len(rows), size=requests)
+    latencies, rejected = [], []
+    start = time.perf_counter()
+    await asyncio.gather(*(run_connection(open_connection, rows, picks[c::connections],
+                                          latencies, rejected)
+                           for c in range(connections)))
+    return np.array(latencies), time.perf_counter() - start, rejected
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Load generator for candidate_server.py: p50/p99 latency and throughput")
+    parser.add_argument('query_features_path')
+    parser.add_argument('--socket', default=None, help="Server Unix socket path")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=7878)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--connections', type=int, default=16,
+                        help="Concurrent client connections, each with one query in flight")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    try:
+        rows = load_features(args.query_features_path)
+    except Exception as e:
+        print(f"Error loading query features: {e}")
+        sys.exit(1)
+    if isinstance(rows, PackedFeatures):
+        rows = rows.unpack()
+
+    def open_connection():
+        if args.socket:
+            return asyncio.open_unix_connection(args.socket)
+        return asyncio.open_connection(args.host, args.port)
+
+    try:
+        latencies, elapsed, rejected = asyncio.run(
+            run_load(open_connection, rows, args.requests, args.connections, args.seed))
+    except OSError as e:
+        print(f"Error talking to the server: {e}")
+        sys.exit(1)
+
+    p50, p99 = np.percentile(latencies, [50, 99]) * 1e3
+    print(f"{len(latencies)} queries over {args.connections} connections in {elapsed:.2f}s")
+    print(f"Latency: p50 {p50:.2f}ms, p99 {p99:.2f}ms")
+    print(f"Throughput: {len(latencies) / max(elapsed, 1e-9):.1f} queries/s")
+    if rejected:
+        print(f"Warning: {len(rejected)} queries rejected (feature count mismatch)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+import sys
+import struct
+import argparse
+import numpy as np
+
+# Binary candidate-list file (.cand), little-endian:
+#   header   8-byte MAGIC, uint64 num_db
+#   records  one per query, in write order:
+#              uint8 kind, uint64 count, uint64 payload bytes, payload
+#            kind VARINT: ascending ids as gaps (first id, then differences),
+#                         7 bits per byte, high bit set on all but a value's last byte
+#            kind BITMAP: ceil(num_db / 8) bytes, bit i (LSB first) = graph i
+#            Each list is stored in whichever of the two is smaller.
+#   footer   uint64 record offsets [num_queries + 1], int64 query ids [num_queries]
+#   trailer  uint64 num_queries, uint64 footer offset, 8-byte MAGIC
+MAGIC = b'QCAND\x00\x01\x00'
+VARINT, BITMAP = 0, 1
+RECORD = struct.Struct('<BQQ')
+HEADER = struct.Struct('<8sQ')
+TRAILER = struct.Struct('<QQ8s')
+# Smallest value needing k + 2 varint bytes, for k = 0..8
+VARINT_LIMITS = np.array([1 << (7 * k) for k in range(1, 10)], dtype=np.uint64)
+
+def is_candidate_file(path):
+    with open(path, 'rb') as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+def encode_varint(ids):
+    """Gap + varint encoding of an ascending id array, all in NumPy."""
+    values = np.diff(np.asarray(ids, dtype=np.int64), prepend=0).astype(np.uint64)
+    top = int(values.max()) if len(values) else 0
+    if top < 0x80:
+        return values.astype(np.uint8)
+    lengths = np.ones(len(values), dtype=np.int64)
+    for limit in VARINT_LIMITS[VARINT_LIMITS <= np.uint64(top)]:
+        lengths += values >= limit
+    starts = np.cumsum(lengths) - lengths
+    out = np.empty(int(starts[-1] + lengths[-1]), dtype=np.uint8)
+    for k in range(int(lengths.max())):
+        sel = np.flatnonzero(lengths > k)
+        byte = ((values[sel] >> np.uint64(7 * k)) & np.uint64(0x7F)).astype(np.uint8)
+        byte[lengths[sel] > k + 1] |= 0x80
+        out[starts[sel] + k] = byte
+    return out
+
+def decode_varint(payload, count):
+    if count == 0:
+        return np.zeros(0, dtype=np.int64)
+    payload = np.frombuffer(payload, dtype=np.uint8)
+    last = (payload & 0x80) == 0
+    value_of = np.cumsum(last) - last
+    starts = np.flatnonzero(np.concatenate([[True], last[:-1]]))
+    shift = (np.arange(len(payload)) - starts[value_of]) * 7
+    parts = (payload & 0x7F).astype(np.uint64) << shift.astype(np.uint64)
+    gaps = np.add.reduceat(parts, starts)
+    return np.cumsum(gaps.astype(np.int64))
+
+def encode_bitmap(ids, num_db):
+    mask = np.zeros(num_db, dtype=bool)
+    mask[ids] = True
+    return np.packbits(mask, bitorder='little')
+
+def decode_bitmap(payload, num_db):
+    bits = np.unpackbits(np.frombuffer(payload, dtype=np.uint8), count=num_db, bitorder='little')
+    return np.flatnonzero(bits)
+
+class BinaryCandidateWriter:
+    """Same write(qid, ids) / flush() interface as CandidateWriter, for the .cand format."""
+
+    def __init__(self, f, num_db, flush_bytes=1 << 22):
+        self.f = f
+        self.num_db = num_db
+        self.bitmap_bytes = (num_db + 7) // 8
+        self.flush_bytes = flush_bytes
+        self.parts = []
+        self.size = 0
+        self.offsets = [HEADER.size]
+        self.qids = []
+        f.write(HEADER.pack(MAGIC, num_db))
+
+    def write(self, qid, candidate_indices):
+        ids = np.asarray(candidate_indices, dtype=np.int64)
+        # A varint list takes at least one byte per id, so long lists skip it
+        payload, kind = None, BITMAP
+        if len(ids) < self.bitmap_bytes:
+            payload, kind = encode_varint(ids), VARINT
+        if payload is None or len(payload) > self.bitmap_bytes:
+            payload, kind = encode_bitmap(ids, self.num_db), BITMAP
+        record = RECORD.pack(kind, len(ids), len(payload)) + payload.tobytes()
+        self.parts.append(record)
+        self.size += len(record)
+        self.offsets.append(self.offsets[-1] + len(record))
+        self.qids.append(qid)
+        if self.size >= self.flush_bytes:
+            self.flush()
+
+    def flush(self):
+        if self.parts:
+            self.f.write(b''.join(self.parts))
+            self.parts = []
+            self.size = 0
+
+    def close(self):
+        """Writes the footer; the file is not readable before this."""
+        self.flush()
+        footer = self.offsets[-1]
+        self.f.write(np.asarray(self.offsets, dtype='<u8').tobytes())
+        self.f.write(np.asarray(self.qids, dtype='<i8').tobytes())
+        self.f.write(TRAILER.pack(len(self.qids), footer, MAGIC))
+
+class CandidateLists:
+    """
+    Random-access reader for .cand files: len(), lists[k] -> (query id,
+    candidate ids) and iteration in file order. The file is memory-mapped.
+    """
+
+    def __init__(self, path):
+        self.data = np.memmap(path, dtype=np.uint8, mode='r')
+        magic, self.num_db = HEADER.unpack(self.data[:HEADER.size].tobytes())
+        num_queries, footer, tail = TRAILER.unpack(self.data[-TRAILER.size:].tobytes())
+        if magic != MAGIC or tail != MAGIC:
+            raise ValueError(f"{path} is not a candidate list file")
+        table = self.data[footer:footer + 8 * (2 * num_queries + 1)]
+        self.offsets = table[:8 * (num_queries + 1)].view('<u8')
+        self.qids = table[8 * (num_queries + 1):].view('<i8')
+
+    def __len__(self):
+        return len(self.qids)
+
+    def __getitem__(self, k):
+        start = int(self.offsets[k])
+        kind, count, nbytes = RECORD.unpack(self.data[start:start + RECORD.size].tobytes())
+        payload = self.data[start + RECORD.size:start + RECORD.size + nbytes]
+        if kind == BITMAP:
+            ids = decode_bitmap(payload, self.num_db)
+        else:
+            ids = decode_varint(payload, count)
+        return int(self.qids[k]), ids
+
+    def __iter__(self):
+        for k in range(len(self)):
+            yield self[k]
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Convert a binary .cand candidate file to the 'q # / c #' text format")
+    parser.add_argument('input_path')
+    parser.add_argument('output_path')
+    args = parser.parse_args()
+
+    try:
+        lists = CandidateLists(args.input_path)
+        with open(args.output_path, 'w') as f:
+            for qid, ids in lists:
+                f.write(f"q # {qid}\nc # {' '.join(map(str, ids.tolist()))}\n")
+    except (IOError, ValueError) as e:
+        print(f"Error converting {args.input_path}: {e}")
+        sys.exit(1)
+    print(f"Wrote {len(lists)} candidate lists to {args.output_path}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,235 @@
+import sys
+import os
+import signal
+import struct
+import asyncio
+import argparse
+import numpy as np
+
+from feature_bits import PackedFeatures, is_binary, load_features
+from feature_index import load_or_build_index
+from generate_candidates import block_sizes, candidate_blocks, prepare_features
+
+# Wire protocol, little-endian, any number of requests per connection:
+#   request   uint32 n, then n uint8 feature values (one query row)
+#   response  int32 count, then count uint32 candidate ids, ascending;
+#             count -1 means the request was rejected (wrong width) or
+#             its batch failed to filter
+# Responses come back in request order on each connection.
+REQUEST_HEADER = struct.Struct('<I')
+RESPONSE_HEADER = struct.Struct('<i')
+
+def encode_request(row):
+    row = np.ascontiguousarray(row, dtype=np.uint8)
+    return REQUEST_HEADER.pack(len(row)) + row.tobytes()
+
+def encode_response(ids):
+    if ids is None:
+        return RESPONSE_HEADER.pack(-1)
+    return RESPONSE_HEADER.pack(len(ids)) + np.asarray(ids, dtype='<u4').tobytes()
+
+async def read_response(reader):
+    """Candidate ids for the next response on reader, or None if it was rejected or failed."""
+    (count,) = RESPONSE_HEADER.unpack(await reader.readexactly(RESPONSE_HEADER.size))
+    if count < 0:
+        return None
+    return np.frombuffer(await reader.readexactly(4 * count), dtype='<u4')
+
+class BatchFilter:
+    """
+    Holds the database features resident and answers queries in batches:
+    requests that arrive within window seconds of the first one waiting
+    (up to max_batch) go through a single vectorized filtering pass.
+    """
+
+    def __init__(self, db_feats, index=None, window=0.002, max_batch=256, mem_bytes=64 << 20):
+        self.num_features = db_feats.shape[1]
+        self.index = index
+        self.window = window
+        self.max_batch = max_batch
+        if isinstance(db_feats, PackedFeatures):
+            self.engine = 'packed'
+        else:
+            self.engine = 'matmul' if is_binary(db_feats) else 'compare'
+        self.db = prepare_features(db_feats, self.engine)
+        self.mem_bytes = mem_bytes
+        self.queue = asyncio.Queue()
+        self.batches = 0
+        self.queries = 0
+
+    def submit(self, row):
+        future = asyncio.get_running_loop().create_future()
+        self.queue.put_nowait((row, future))
+        return future
+
+    def filter(self, rows):
+        if self.index is not None:
+            return [self.index.candidates(row) for row in rows]
+        if self.engine != 'compare':
+            # Binary engines read any non-zero value as present
+            rows = (rows != 0).astype(np.uint8)
+        queries = prepare_features(rows, self.engine)
+        query_block, db_block = block_sizes(len(self.db), self.db.shape[1], self.engine,
+                                            self.mem_bytes)
+        return [ids for _, lists in candidate_blocks(self.db, queries, self.engine,
+                                                      query_block, db_block, self.mem_bytes)
+                for ids in lists]
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.window
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            while len(batch) < self.max_batch and not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+
+            try:
+                lists = self.filter(np.stack([row for row, _ in batch]))
+            except Exception as e:
+                # Fail this batch only; its clients get an error frame
+                print(f"Error filtering a batch of {len(batch)} queries: {e!r}", flush=True)
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            for (_, future), ids in zip(batch, lists):
+                if not future.done():
+                    future.set_result(ids)
+            self.batches += 1
+            self.queries += len(batch)
+
+async def handle_connection(batcher, reader, writer):
+    pending = asyncio.Queue()
+
+    async def respond():
+        while True:
+            future = await pending.get()
+            if future is None:
+                break
+            try:
+                ids = await future
+            except Exception:
+                ids = None
+            writer.write(encode_response(ids))
+            await writer.drain()
+
+    responder = asyncio.create_task(respond())
+    try:
+        while True:
+            (n,) = REQUEST_HEADER.unpack(await reader.readexactly(REQUEST_HEADER.size))
+            row = np.frombuffer(await reader.readexactly(n), dtype=np.uint8)
+            if n == batcher.num_features:
+                future = batcher.submit(row)
+            else:
+                future = asyncio.get_running_loop().create_future()
+                future.set_result(None)
+            await pending.put(future)
+    except (asyncio.IncompleteReadError, ConnectionError):
+        pass
+    finally:
+        await pending.put(None)
+        try:
+            await responder
+        except ConnectionError:
+            pass
+        writer.close()
+
+async def serve(batcher, socket_path=None, host='127.0.0.1', port=7878):
+    """
+    Runs until SIGINT or SIGTERM, which cancel the serving task. If the
+    batching task dies, the server stops and RuntimeError is raised.
+    """
+    loop = asyncio.get_running_loop()
+    serving = asyncio.current_task()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, serving.cancel)
+    batch_task = asyncio.create_task(batcher.run())
+
+    def on_batch_done(task):
+        if not task.cancelled():
+            print(f"Error: batching task stopped: {task.exception()!r}", flush=True)
+            serving.cancel()
+
+    batch_task.add_done_callback(on_batch_done)
+
+    def on_connect(reader, writer):
+        return handle_connection(batcher, reader, writer)
+
+    if socket_path:
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        server = await asyncio.start_unix_server(on_connect, path=socket_path)
+        where = socket_path
+    else:
+        server = await asyncio.start_server(on_connect, host=host, port=port)
+        where = f"{host}:{port}"
+    print(f"Serving {len(batcher.db)} database graphs ({batcher.num_features} features, "
+          f"{'index' if batcher.index is not None else batcher.engine}) on {where}", flush=True)
+    try:
+        async with server:
+            await server.serve_forever()
+    except asyncio.CancelledError:
+        if batch_task.done() and not batch_task.cancelled():
+            raise RuntimeError("batching task stopped") from batch_task.exception()
+        raise
+    finally:
+        batch_task.cancel()
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Resident candidate-filtering server; batches queries arriving close together")
+    parser.add_argument('db_features_path')
+    parser.add_argument('--socket', default=None, help="Listen on this Unix socket path")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=7878,
+                        help="Localhost TCP port, used when --socket is not given")
+    parser.add_argument('--window-ms', type=float, default=2.0,
+                        help="How long a batch waits for more queries after its first one")
+    parser.add_argument('--max-batch', type=int, default=256)
+    parser.add_argument('--mem-mb', type=int, default=64,
+                        help="Ceiling for the per-block temporaries in MB")
+    parser.add_argument('--index', default=None,
+                        help="Answer from the inverted index at this path (built if missing)")
+    args = parser.parse_args()
+
+    try:
+        db_feats = load_features(args.db_features_path)
+        index = load_or_build_index(args.index, args.db_features_path) if args.index else None
+    except Exception as e:
+        print(f"Error loading features or index: {e}")
+        sys.exit(1)
+
+    async def run():
+        batcher = BatchFilter(db_feats, index, args.window_ms / 1000.0, args.max_batch,
+                              args.mem_mb << 20)
+        try:
+            await serve(batcher, args.socket, args.host, args.port)
+        finally:
+            if batcher.batches:
+                print(f"\nAnswered {batcher.queries} queries in {batcher.batches} batches "
+                      f"({batcher.queries / batcher.batches:.1f} per batch)")
+
+    try:
+        asyncio.run(run())
+    except (KeyboardInterrupt, asyncio.CancelledError):
+        pass
+    except RuntimeError as e:
+        print(f"Error: server stopped, {e}")
+        sys.exit(1)
+    except OSError as e:
+        print(f"Error starting server: {e}")
+        sys.exit(1)
+    finally:
+        if args.socket and os.path.exists(args.socket):
+            os.remove(args.socket)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+import numpy as np
+
+import small_matcher
+
+# Isomorphism classes of the graphs in a GraphDB. Graphs are first bucketed
+# by a label-refined (Weisfeiler-Lehman style) hash computed for the whole
+# database at once on the CSR arrays; graphs sharing a bucket are then
+# confirmed isomorphic by an exact match, so a hash collision never merges
+# two different graphs.
+
+WL_ROUNDS = 3
+
+def _mix(x):
+    """splitmix64 finalizer on a uint64 array (wrapping arithmetic)."""
+    x = x ^ (x >> np.uint64(30))
+    x = x * np.uint64(0xBF58476D1CE4E5B9)
+    x = x ^ (x >> np.uint64(27))
+    x = x * np.uint64(0x94D049BB133111EB)
+    return x ^ (x >> np.uint64(31))
+
+def _segment_sums(values, offsets):
+    """Wrapping uint64 sum of values[offsets[k]:offsets[k + 1]] for every k."""
+    sums = np.concatenate([[np.uint64(0)], np.cumsum(values, dtype=np.uint64)])
+    return sums[offsets[1:]] - sums[offsets[:-1]]
+
+def wl_hashes(db, rounds=WL_ROUNDS):
+    """
+    One uint64 per graph, equal for isomorphic graphs. Each round a node's
+    colour becomes a hash of its colour and the multiset of (bond label,
+    neighbour colour) pairs around it; multisets are hashed as wrapping sums
+    of mixed entries, so no per-node sorting is needed.
+    """
+    with np.errstate(over='ignore'):
+        colour = _mix(db.node_labels.astype(np.int64).astype(np.uint64) + np.uint64(1))
+        bond = _mix(db.adj_labels.astype(np.int64).astype(np.uint64) + np.uint64(0x9E3779B97F4A7C15))
+        for _ in range(rounds):
+            around = _segment_sums(_mix(colour[db.adj_indices] ^ bond), db.adj_offsets)
+            colour = _mix(colour * np.uint64(31) + around)
+        sizes = _mix(np.diff(db.node_offsets).astype(np.uint64)) ^ np.diff(
+            db.adj_offsets[db.node_offsets]).astype(np.uint64)
+        return _segment_sums(_mix(colour), db.node_offsets) ^ sizes
+
+def isomorphism_classes(db):
+    """
+    Returns (representatives, inverse): the first graph of every
+    isomorphism class in db order, and for each graph the position of its
+    class in representatives, so db.take(representatives)[inverse]
+    reproduces db up to isomorphism.
+    """
+    hashes = wl_hashes(db)
+    distinct, bucket = np.unique(hashes, return_inverse=True)
+    bucket = bucket.reshape(-1)
+    if len(distinct) == len(db):
+        return np.arange(len(db), dtype=np.int64), np.arange(len(db), dtype=np.int64)
+
+    label_freq = small_matcher.label_frequencies(db)
+    nodes = np.diff(db.node_offsets)
+    entries = np.diff(db.adj_offsets[db.node_offsets])
+    rep_of = np.arange(len(db), dtype=np.int64)
+    bucket_reps = {}
+    for g in range(len(db)):
+        reps = bucket_reps.setdefault(int(bucket[g]), [])
+        if reps:
+            graph = small_matcher.prepare_graph(db, g)
+            for r in reps:
+                # With equal node and edge counts an induced embedding is an isomorphism
+                if nodes[r] != nodes[g] or entries[r] != entries[g]:
+                    continue
+                if small_matcher.contains(graph, small_matcher.prepare_pattern(db, r, label_freq)):
+                    rep_of[g] = r
+                    break
+        if rep_of[g] == g:
+            reps.append(g)
+
+    representatives = np.flatnonzero(rep_of == np.arange(len(db)))
+    position = np.zeros(len(db), dtype=np.int64)
+    position[representatives] = np.arange(len(representatives))
+    return representatives, position[rep_of]
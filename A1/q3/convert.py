@@ -1,104 +1,499 @@
 import sys
-import os
-import networkx as nx
+import argparse
+from functools import partial
+import multiprocessing as mp
+from multiprocessing import shared_memory
 import numpy as np
 import networkx.algorithms.isomorphism as iso
 
-LABEL_MAPPING = {
-    'Br': 0, 'C': 1, 'Cl': 2, 'F': 3, 'H': 4, 
-    'I': 5, 'N': 6, 'O': 7, 'P': 8, 'S': 9, 'Si': 10
-}
+from graph_db import load_graph_db
+from feature_bits import save_packed
+import small_matcher
+from feature_cache import FeatureCache, graph_keys
+from match_profile import MatchProfile, print_summary, write_report
+from canonical import isomorphism_classes
+
+MATCHERS = ('vf2', 'small')
 
 def parse_graph_file(file_path, is_gspan_format=False):
-    graphs = []
-    current_graph = None
-    
     try:
-        with open(file_path, 'r') as f:
-            for line in f:
-                line = line.strip()
-                if not line: continue
-                
-                parts = line.split()
-                
-                if line.startswith('#') or line.startswith('t #') or line.startswith('Graph'):
-                    if current_graph is not None:
-                        graphs.append(current_graph)
-                    current_graph = nx.Graph()
-                    continue
-                
-                if current_graph is None: current_graph = nx.Graph()
-
-                if parts[0] == 'v':
-                    node_id = int(parts[1])
-                    raw_label = parts[2]
-                    
-                    if is_gspan_format:
-                        label_int = int(raw_label)
-                    else:
-                        if raw_label.isdigit():
-                            label_int = int(raw_label)
-                        else:
-                            label_int = LABEL_MAPPING.get(raw_label, -1)
-                            
-                    if label_int != -1:
-                        current_graph.add_node(node_id, label=label_int)
-
-                elif parts[0] == 'e':
-                    src = int(parts[1])
-                    dst = int(parts[2])
-                    edge_label = int(parts[3])
-                    current_graph.add_edge(src, dst, label=edge_label)
-            
-            if current_graph is not None:
-                graphs.append(current_graph)
-                
+        return load_graph_db(file_path, is_gspan_format)
     except Exception as e:
         print(f"Error parsing {file_path}: {e}")
         sys.exit(1)
-        
-    return graphs
 
-def generate_features(dataset_graphs, subgraphs):
+def _edge_keys(db):
+    """
+    One int64 key per undirected edge of db encoding (lower label, higher
+    label, bond label), plus the graph each edge belongs to.
+    """
+    src = np.repeat(np.arange(db.total_nodes, dtype=np.int64), db.degrees())
+    dst = db.adj_indices
+    once = src <= dst
+    src, dst = src[once], dst[once]
+    lu = db.node_labels[src].astype(np.int64) + 1
+    lv = db.node_labels[dst].astype(np.int64) + 1
+    lo, hi = np.minimum(lu, lv), np.maximum(lu, lv)
+    keys = (lo << 32) | (hi << 16) | (db.adj_labels[once].astype(np.int64) + 1)
+    return keys, db.graph_of_node()[src]
+
+def build_invariant_vocab(subgraphs):
+    """Node labels and (label, label, bond) types that occur in any pattern."""
+    node_vocab = np.unique(subgraphs.node_labels)
+    edge_vocab = np.unique(_edge_keys(subgraphs)[0])
+    return node_vocab, edge_vocab
+
+def _vocab_index(values, vocab):
+    """Position of each value in the sorted vocab, or -1 if it is not there."""
+    if len(vocab) == 0:
+        return np.full(len(values), -1, dtype=np.int64)
+    pos = np.minimum(np.searchsorted(vocab, values), len(vocab) - 1)
+    return np.where(vocab[pos] == values, pos, -1)
+
+def compute_invariants(graphs, node_vocab, edge_vocab):
+    """
+    One row per graph: [label counts | bond-type counts | max degree per label].
+    Only labels and bond types listed in the vocab are counted.
+    """
+    num_graphs = len(graphs)
+    num_labels = len(node_vocab)
+    num_edges = len(edge_vocab)
+    inv = np.zeros((num_graphs, 2 * num_labels + num_edges), dtype=np.int32)
+    deg_base = num_labels + num_edges
+
+    gid = graphs.graph_of_node()
+    k = _vocab_index(graphs.node_labels, node_vocab)
+    hit = k >= 0
+    if num_labels:
+        inv[:, :num_labels] = np.bincount(
+            gid[hit] * num_labels + k[hit], minlength=num_graphs * num_labels
+        ).reshape(num_graphs, num_labels)
+        np.maximum.at(inv, (gid[hit], deg_base + k[hit]), graphs.degrees()[hit].astype(np.int32))
+
+    keys, egid = _edge_keys(graphs)
+    k = _vocab_index(keys, edge_vocab)
+    hit = k >= 0
+    if num_edges:
+        inv[:, num_labels:deg_base] = np.bincount(
+            egid[hit] * num_edges + k[hit], minlength=num_graphs * num_edges
+        ).reshape(num_graphs, num_edges)
+    return inv
+
+def prefilter_mask(graph_inv, pattern_inv, block_size=4096):
+    """
+    (num_graphs, num_patterns) bool mask of pairs that survive the invariant
+    test: a pattern can only embed if none of its counts exceed the graph's.
+    """
+    num_graphs = graph_inv.shape[0]
+    mask = np.empty((num_graphs, pattern_inv.shape[0]), dtype=bool)
+    for start in range(0, num_graphs, block_size):
+        block = graph_inv[start:start + block_size]
+        mask[start:start + block_size] = np.all(
+            pattern_inv[None, :, :] <= block[:, None, :], axis=2)
+    return mask
+
+def compute_prefilter(dataset_graphs, subgraphs):
+    node_vocab, edge_vocab = build_invariant_vocab(subgraphs)
+    graph_inv = compute_invariants(dataset_graphs, node_vocab, edge_vocab)
+    pattern_inv = compute_invariants(subgraphs, node_vocab, edge_vocab)
+    mask = prefilter_mask(graph_inv, pattern_inv)
+
+    total = mask.size
+    pruned = total - int(np.count_nonzero(mask))
+    pct = 100.0 * pruned / total if total else 0.0
+    print(f"Prefilter pruned {pruned}/{total} (graph, subgraph) pairs ({pct:.1f}%)")
+    return mask
+
+class PatternLattice:
+    """
+    Containment among the patterns themselves: subsets[j] marks every pattern
+    contained in pattern j and supersets[j] every pattern containing it (both
+    include j). order lists the patterns smallest first, a topological order
+    of the containment DAG.
+    """
+
+    def __init__(self, order, subsets, supersets):
+        self.order = order
+        self.subsets = subsets
+        self.supersets = supersets
+
+def build_pattern_lattice(subgraphs, patterns):
+    """
+    Tests every pattern pair once. Containment is transitive for the induced
+    matching GraphMatcher does, so the pairwise relation is already closed.
+    """
+    nm = iso.categorical_node_match('label', -1)
+    em = iso.categorical_edge_match('label', -1)
+    num = len(patterns)
+
+    node_vocab, edge_vocab = build_invariant_vocab(subgraphs)
+    inv = compute_invariants(subgraphs, node_vocab, edge_vocab)
+    # contains[p, q]: pattern q embeds in pattern p
+    contains = prefilter_mask(inv, inv)
+    for p in range(num):
+        for q in range(num):
+            if p != q and contains[p, q]:
+                matcher = iso.GraphMatcher(patterns[p], patterns[q], node_match=nm, edge_match=em)
+                contains[p, q] = matcher.subgraph_is_isomorphic()
+
+    sizes = [(S.number_of_nodes(), S.number_of_edges()) for S in patterns]
+    order = sorted(range(num), key=lambda j: sizes[j])
+    lattice = PatternLattice(order, contains, contains.T.copy())
+
+    pairs = int(contains.sum()) - num
+    print(f"Pattern lattice: {pairs} containment pairs among {num} subgraphs")
+    return lattice
+
+def vf2_contains(graph, subgraph):
+    nm = iso.categorical_node_match('label', -1)
+    em = iso.categorical_edge_match('label', -1)
+    matcher = iso.GraphMatcher(graph, subgraph, node_match=nm, edge_match=em)
+    return matcher.subgraph_is_isomorphic()
+
+def vf2_count(graph, subgraph, cap):
+    """Distinct embedded node sets of subgraph in graph, counting no further than cap."""
+    nm = iso.categorical_node_match('label', -1)
+    em = iso.categorical_edge_match('label', -1)
+    matcher = iso.GraphMatcher(graph, subgraph, node_match=nm, edge_match=em)
+    occurrences = set()
+    for mapping in matcher.subgraph_isomorphisms_iter():
+        occurrences.add(frozenset(mapping))
+        if len(occurrences) >= cap:
+            break
+    return len(occurrences)
+
+def prepare_patterns(dataset_graphs, subgraphs, matcher):
+    """The per-pattern objects the chosen matcher's contains() expects."""
+    if matcher == 'small':
+        label_freq = small_matcher.label_frequencies(dataset_graphs)
+        return small_matcher.prepare_patterns(subgraphs, label_freq)
+    return list(subgraphs)
+
+def match_graph(dataset_graphs, g, matcher):
+    """The per-graph object the chosen matcher's contains() expects."""
+    if matcher == 'small':
+        return small_matcher.prepare_graph(dataset_graphs, g)
+    return dataset_graphs[g]
+
+def contains_fn(matcher, count_cap=None):
+    """
+    The per-pair test: presence, or with count_cap the capped number of
+    distinct embeddings (0 still meaning absent).
+    """
+    if count_cap is not None:
+        count = small_matcher.count_embeddings if matcher == 'small' else vf2_count
+        return partial(count, cap=count_cap)
+    return small_matcher.contains if matcher == 'small' else vf2_contains
+
+def feature_dtype(count_cap):
+    return int if count_cap is None else np.uint8
+
+def match_row(graph, subgraphs, row, candidates=None, lattice=None, contains=vf2_contains,
+              known=None, counts=False):
+    """
+    Fills row for one graph and returns the number of subgraph tests it ran.
+    Cells flagged in known already hold their (cached) value and are skipped.
+    With counts, contains returns embedding counts and the lattice only
+    propagates misses, since a sub-pattern's count is not implied by a hit.
+    """
+    calls = 0
+
+    if lattice is None:
+        for j, subgraph in enumerate(subgraphs):
+            if candidates is not None and not candidates[j]:
+                continue
+            if known is not None and known[j]:
+                continue
+            calls += 1
+            value = contains(graph, subgraph)
+            if value:
+                row[j] = value
+        return calls
+
+    # A hit implies every sub-pattern is present, a miss that every
+    # super-pattern is absent; either way those cells need no VF2 test.
+    done = np.zeros(len(subgraphs), dtype=bool)
+    if known is not None:
+        for j in np.flatnonzero(known):
+            if row[j] and counts:
+                done[j] = True
+            elif row[j]:
+                row[lattice.subsets[j]] = 1
+                done |= lattice.subsets[j]
+            else:
+                done |= lattice.supersets[j]
+    for j in lattice.order:
+        if done[j]:
+            continue
+        hit = 0
+        if candidates is None or candidates[j]:
+            calls += 1
+            hit = contains(graph, subgraphs[j])
+        if hit and counts:
+            row[j] = hit
+            done[j] = True
+        elif hit:
+            row[lattice.subsets[j]] = 1
+            done |= lattice.subsets[j]
+        else:
+            done |= lattice.supersets[j]
+    return calls
+
+def report_vf2_calls(calls, num_graphs, num_subgraphs):
+    total = num_graphs * num_subgraphs
+    pct = 100.0 * calls / total if total else 0.0
+    print(f"\nRan {calls}/{total} subgraph isomorphism tests ({pct:.1f}%)")
+
+def lookup_cache(cache, dataset_graphs, subgraphs):
+    """Cached cells as (keys for the later store, values, known mask)."""
+    g_keys, p_keys = graph_keys(dataset_graphs), graph_keys(subgraphs)
+    values, known = cache.lookup(g_keys, p_keys)
+    total = known.size
+    hits = int(np.count_nonzero(known))
+    pct = 100.0 * hits / total if total else 0.0
+    print(f"Feature cache: reused {hits}/{total} cells ({pct:.1f}%)")
+    return (g_keys, p_keys), values, known
+
+def deduplicated(generate, dataset_graphs, subgraphs, profile=None):
+    """
+    Runs generate(graphs, patterns) on one member of every isomorphism class
+    of the graphs and of the patterns, then fans the matrix back out:
+    isomorphic graphs share a feature row and isomorphic patterns a column.
+    """
+    graph_reps, graph_inv = isomorphism_classes(dataset_graphs)
+    pattern_reps, pattern_inv = isomorphism_classes(subgraphs)
+    if len(graph_reps) == len(dataset_graphs) and len(pattern_reps) == len(subgraphs):
+        return generate(dataset_graphs, subgraphs)
+
+    print(f"Deduplicated: {len(graph_reps)}/{len(dataset_graphs)} distinct graphs, "
+          f"{len(pattern_reps)}/{len(subgraphs)} distinct subgraphs")
+    unique = generate(dataset_graphs.take(graph_reps), subgraphs.take(pattern_reps))
+    if profile is not None:
+        profile.remap(graph_reps, pattern_reps)
+    return unique[np.ix_(graph_inv, pattern_inv)]
+
+def generate_features(dataset_graphs, subgraphs, prefilter=True, lattice=True, matcher='vf2',
+                      cache=None, count_cap=None, profile=None, dedup=True):
+    if dedup:
+        return deduplicated(
+            lambda graphs, patterns: generate_features(graphs, patterns, prefilter, lattice, matcher,
+                                                       cache, count_cap, profile, dedup=False),
+            dataset_graphs, subgraphs, profile)
+
     num_graphs = len(dataset_graphs)
     num_subgraphs = len(subgraphs)
     
     print(f"Generating features for {num_graphs} graphs against {num_subgraphs} subgraphs")
     
-    feature_matrix = np.zeros((num_graphs, num_subgraphs), dtype=int)
-    nm = iso.categorical_node_match('label', -1)
-    em = iso.categorical_edge_match('label', -1)
+    feature_matrix = np.zeros((num_graphs, num_subgraphs), dtype=feature_dtype(count_cap))
+    known = None
+    if cache is not None:
+        keys, feature_matrix[:], known = lookup_cache(cache, dataset_graphs, subgraphs)
+        if known.all():
+            prefilter = lattice = False
+    mask = compute_prefilter(dataset_graphs, subgraphs) if prefilter else None
+    pattern_lattice = build_pattern_lattice(subgraphs, list(subgraphs)) if lattice else None
+    patterns = prepare_patterns(dataset_graphs, subgraphs, matcher)
+    contains = contains_fn(matcher, count_cap)
+    if profile is not None:
+        contains = profile.wrap(contains, patterns)
+    calls = 0
     
-    for i, graph in enumerate(dataset_graphs):
+    for i in range(num_graphs):
         if i % 100 == 0:
             print(f"Processing graph {i}/{num_graphs}...", end='\r')
+        if known is not None and known[i].all():
+            continue
             
-        for j, subgraph in enumerate(subgraphs):
-            matcher = iso.GraphMatcher(graph, subgraph, node_match=nm, edge_match=em)
-            if matcher.subgraph_is_isomorphic():
-                feature_matrix[i, j] = 1
+        graph = match_graph(dataset_graphs, i, matcher)
+        if profile is not None:
+            profile.set_graph(i, dataset_graphs.num_nodes(i))
+        calls += match_row(graph, patterns, feature_matrix[i],
+                           None if mask is None else mask[i], pattern_lattice, contains,
+                           None if known is None else known[i], count_cap is not None)
                 
+    report_vf2_calls(calls, num_graphs, num_subgraphs)
+    if cache is not None:
+        cache.store(*keys, feature_matrix)
+    return feature_matrix
+
+# Worker state, set once per process by _init_worker so the pattern set is
+# shipped at pool startup instead of with every shard.
+_worker_subgraphs = None
+_worker_lattice = None
+_worker_matcher = None
+_worker_count_cap = None
+_worker_profile = False
+_worker_shm = None
+_worker_matrix = None
+
+def _init_worker(patterns, lattice, matcher, count_cap, profile, shm_name, shape):
+    global _worker_subgraphs, _worker_lattice, _worker_matcher, _worker_count_cap
+    global _worker_profile, _worker_shm, _worker_matrix
+    _worker_subgraphs = patterns
+    _worker_lattice = lattice
+    _worker_matcher = matcher
+    _worker_count_cap = count_cap
+    _worker_profile = profile
+    _worker_shm = shared_memory.SharedMemory(name=shm_name)
+    _worker_matrix = np.ndarray(shape, dtype=feature_dtype(count_cap), buffer=_worker_shm.buf)
+
+def _match_shard(task):
+    start, graphs, mask, known = task
+    calls = 0
+    contains = contains_fn(_worker_matcher, _worker_count_cap)
+    profile = MatchProfile() if _worker_profile else None
+    if profile is not None:
+        contains = profile.wrap(contains, _worker_subgraphs)
+    for offset in range(len(graphs)):
+        if known is not None and known[offset].all():
+            continue
+        graph = match_graph(graphs, offset, _worker_matcher)
+        if profile is not None:
+            profile.set_graph(start + offset, graphs.num_nodes(offset))
+        calls += match_row(graph, _worker_subgraphs, _worker_matrix[start + offset],
+                           None if mask is None else mask[offset], _worker_lattice, contains,
+                           None if known is None else known[offset],
+                           _worker_count_cap is not None)
+    return len(graphs), calls, None if profile is None else profile.records()
+
+def generate_features_parallel(dataset_graphs, subgraphs, workers, shard_size=64, prefilter=True,
+                               lattice=True, matcher='vf2', cache=None, count_cap=None,
+                               profile=None, dedup=True):
+    if dedup:
+        return deduplicated(
+            lambda graphs, patterns: generate_features_parallel(
+                graphs, patterns, workers, shard_size, prefilter, lattice, matcher, cache,
+                count_cap, profile, dedup=False),
+            dataset_graphs, subgraphs, profile)
+
+    num_graphs = len(dataset_graphs)
+    num_subgraphs = len(subgraphs)
+    shape = (num_graphs, num_subgraphs)
+
+    print(f"Generating features for {num_graphs} graphs against {num_subgraphs} subgraphs ({workers} workers)")
+    known = None
+    if cache is not None:
+        keys, cached, known = lookup_cache(cache, dataset_graphs, subgraphs)
+        if known.all():
+            prefilter = lattice = False
+    mask = compute_prefilter(dataset_graphs, subgraphs) if prefilter else None
+    pattern_lattice = build_pattern_lattice(subgraphs, list(subgraphs)) if lattice else None
+
+    dtype = feature_dtype(count_cap)
+    nbytes = max(int(np.prod(shape)) * np.dtype(dtype).itemsize, 1)
+    shm = shared_memory.SharedMemory(create=True, size=nbytes)
+    try:
+        shared = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+        shared[:] = 0 if known is None else cached
+
+        tasks = ((start, dataset_graphs[start:start + shard_size],
+                  None if mask is None else mask[start:start + shard_size],
+                  None if known is None else known[start:start + shard_size])
+                 for start in range(0, num_graphs, shard_size))
+
+        done = calls = 0
+        with mp.Pool(workers, initializer=_init_worker,
+                     initargs=(prepare_patterns(dataset_graphs, subgraphs, matcher),
+                               pattern_lattice, matcher, count_cap, profile is not None,
+                               shm.name, shape)) as pool:
+            for n, shard_calls, records in pool.imap_unordered(_match_shard, tasks):
+                done += n
+                calls += shard_calls
+                if records is not None:
+                    profile.extend(records)
+                print(f"Processing graph {done}/{num_graphs}...", end='\r')
+        report_vf2_calls(calls, num_graphs, num_subgraphs)
+
+        feature_matrix = shared.copy()
+        del shared
+    finally:
+        shm.close()
+        shm.unlink()
+
+    if cache is not None:
+        cache.store(*keys, feature_matrix)
     return feature_matrix
 
 def main():
-    if len(sys.argv) != 4:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('dataset_path')
+    parser.add_argument('subgraphs_path')
+    parser.add_argument('output_path')
+    parser.add_argument('--workers', type=int, default=1,
+                        help="Number of worker processes for subgraph matching")
+    parser.add_argument('--no-prefilter', action='store_true',
+                        help="Run VF2 on every pair instead of pruning by label/degree invariants first")
+    parser.add_argument('--no-lattice', action='store_true',
+                        help="Test every pattern instead of inferring cells from containment between patterns")
+    parser.add_argument('--matcher', choices=MATCHERS, default='vf2',
+                        help="Subgraph isomorphism engine: networkx VF2 or the array-based small-pattern matcher")
+    parser.add_argument('--cache-dir', default=None,
+                        help="Reuse feature cells computed by earlier runs, keyed by graph and pattern content")
+    parser.add_argument('--cache-max-mb', type=int, default=1024,
+                        help="Size limit of the feature cache; least recently used patterns are evicted first")
+    parser.add_argument('--packed', action='store_true',
+                        help="Save features bit-packed into uint64 words (.npz archive) instead of a dense .npy")
+    parser.add_argument('--counts', action='store_true',
+                        help="Record the number of distinct embeddings (uint8) instead of presence bits")
+    parser.add_argument('--count-cap', type=int, default=15,
+                        help="Largest embedding count recorded per pattern with --counts (1-255)")
+    parser.add_argument('--no-dedup', action='store_true',
+                        help="Match isomorphic graphs and isomorphic subgraphs separately instead of once per class")
+    parser.add_argument('--profile', default=None, metavar='REPORT',
+                        help="Time every subgraph test and write a per-pattern / per-graph-size cost "
+                             "report (JSON, or CSV if REPORT ends in .csv)")
+    args = parser.parse_args()
+
+    count_cap = args.count_cap if args.counts else None
+    if count_cap is not None and not 1 <= count_cap <= 255:
+        print("Error: --count-cap must be between 1 and 255")
+        sys.exit(1)
+    if count_cap is not None and args.packed:
+        print("Error: --packed stores presence bits only and cannot hold --counts features")
         sys.exit(1)
-        
-    dataset_path = sys.argv[1]
-    subgraphs_path = sys.argv[2]
-    output_path = sys.argv[3]
     
-    dataset_graphs = parse_graph_file(dataset_path, is_gspan_format=False)
+    dataset_graphs = parse_graph_file(args.dataset_path, is_gspan_format=False)
     
-    discriminative_subgraphs = parse_graph_file(subgraphs_path, is_gspan_format=True)
+    discriminative_subgraphs = parse_graph_file(args.subgraphs_path, is_gspan_format=True)
     
     if not discriminative_subgraphs:
         print("Error: No subgraphs loaded. Check discriminative_subgraphs.txt")
         sys.exit(1)
         
-    features = generate_features(dataset_graphs, discriminative_subgraphs)
+    cache = None
+    if args.cache_dir:
+        namespace = 'binary' if count_cap is None else f'counts-{count_cap}'
+        cache = FeatureCache(args.cache_dir, args.cache_max_mb << 20, namespace)
+
+    profile = MatchProfile() if args.profile else None
+
+    if args.workers > 1:
+        features = generate_features_parallel(dataset_graphs, discriminative_subgraphs, args.workers,
+                                              prefilter=not args.no_prefilter,
+                                              lattice=not args.no_lattice,
+                                              matcher=args.matcher, cache=cache,
+                                              count_cap=count_cap, profile=profile,
+                                              dedup=not args.no_dedup)
+    else:
+        features = generate_features(dataset_graphs, discriminative_subgraphs,
+                                     prefilter=not args.no_prefilter,
+                                     lattice=not args.no_lattice,
+                                     matcher=args.matcher, cache=cache,
+                                     count_cap=count_cap, profile=profile,
+                                     dedup=not args.no_dedup)
     
-    np.save(output_path, features)
+    if profile is not None:
+        try:
+            print_summary(write_report(profile, args.profile))
+        except IOError as e:
+            print(f"Error writing profile report: {e}")
+            sys.exit(1)
+
+    if args.packed:
+        save_packed(args.output_path, features)
+    else:
+        np.save(args.output_path, features)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -1,8 +1,8 @@
 #!/bin/bash
 
-if [ "$#" -ne 3 ]; then
-    echo "Usage: $0 <path_graphs> <path_discriminative_subgraphs> <path_features>"
+if [ "$#" -lt 3 ]; then
+    echo "Usage: $0 <path_graphs> <path_discriminative_subgraphs> <path_features> [--workers N]"
     exit 1
 fi
 
-python3 convert.py "$1" "$2" "$3"
\ No newline at end of file
+python3 convert.py "$1" "$2" "$3" "${@:4}"
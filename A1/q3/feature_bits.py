@@ -0,0 +1,75 @@
+import mmap
+import numpy as np
+
+# Packed feature files are .npz archives holding the rows as little-endian
+# uint64 words plus the original number of (binary) features.
+WORD_BITS = 64
+
+class PackedFeatures:
+    """Binary feature rows packed into uint64 words, feature j at bit j."""
+
+    def __init__(self, words, num_features):
+        self.words = words
+        self.num_features = num_features
+
+    @property
+    def shape(self):
+        return (self.words.shape[0], self.num_features)
+
+    def __len__(self):
+        return self.words.shape[0]
+
+    def __getitem__(self, rows):
+        if isinstance(rows, slice):
+            return PackedFeatures(self.words[rows], self.num_features)
+        return self.words[rows]
+
+    def unpack(self):
+        return unpack_features(self.words, self.num_features)
+
+def is_binary(features):
+    return features.size == 0 or (features.min() >= 0 and features.max() <= 1)
+
+def pack_features(features):
+    """Packs a dense 0/1 (num_rows, num_features) matrix into PackedFeatures."""
+    features = np.asarray(features)
+    num_rows, num_features = features.shape
+    num_words = (num_features + WORD_BITS - 1) // WORD_BITS
+
+    as_bytes = np.packbits(features.astype(bool), axis=1, bitorder='little')
+    padded = np.zeros((num_rows, num_words * 8), dtype=np.uint8)
+    padded[:, :as_bytes.shape[1]] = as_bytes
+    words = padded.view('<u8').astype(np.uint64, copy=False)
+    return PackedFeatures(np.ascontiguousarray(words), num_features)
+
+def unpack_features(words, num_features, dtype=int):
+    as_bytes = np.ascontiguousarray(words).astype('<u8', copy=False).view(np.uint8)
+    bits = np.unpackbits(as_bytes, axis=1, count=num_features, bitorder='little')
+    return bits.astype(dtype)
+
+def save_packed(path, features):
+    packed = features if isinstance(features, PackedFeatures) else pack_features(features)
+    # Write through a handle so np.savez keeps the caller's file name as is
+    with open(path, 'wb') as f:
+        np.savez(f, words=packed.words, num_features=np.int64(packed.num_features))
+
+def load_features(path, mmap_mode=None):
+    """
+    Returns a dense ndarray for .npy files and PackedFeatures for packed ones.
+    mmap_mode is passed on for .npy files; packed archives are always read in.
+    """
+    data = np.load(path, mmap_mode=mmap_mode)
+    if isinstance(data, np.lib.npyio.NpzFile):
+        with data:
+            return PackedFeatures(data['words'], int(data['num_features']))
+    return data
+
+def release_pages(features):
+    """Drops the resident pages of a memory-mapped matrix; no-op otherwise."""
+    mm = getattr(features, '_mmap', None)
+    if mm is not None and hasattr(mmap, 'MADV_DONTNEED'):
+        mm.madvise(mmap.MADV_DONTNEED)
+
+def superset_mask(q_words, db_words):
+    """Rows of db_words whose bits include every bit set in q_words."""
+    return np.all((q_words & ~db_words) == 0, axis=1)
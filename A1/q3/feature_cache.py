@@ -0,0 +1,95 @@
+import os
+import hashlib
+import numpy as np
+
+# On-disk cache of feature cells, one file per pattern:
+#   <cache_dir>/<namespace>/<pattern key>.npz  ->  sorted graph keys + values
+# Keys are 64-bit BLAKE2b digests of a graph's labels and sorted edge list,
+# so the same molecule maps to the same key whatever file or position it
+# came from. File mtimes record last use for LRU eviction.
+
+def graph_keys(db):
+    """One uint64 content key per graph of a GraphDB."""
+    src = np.repeat(np.arange(db.total_nodes, dtype=np.int64), db.degrees())
+    once = src <= db.adj_indices
+    gid = db.graph_of_node()[src[once]]
+    base = db.node_offsets[gid]
+    lo = src[once] - base
+    hi = db.adj_indices[once] - base
+    lab = db.adj_labels[once].astype(np.int64)
+    order = np.lexsort((lab, hi, lo, gid))
+    edges = np.stack([lo, hi, lab], axis=1)[order]
+    edge_bounds = np.searchsorted(gid[order], np.arange(len(db) + 1))
+
+    keys = np.empty(len(db), dtype=np.uint64)
+    labels = db.node_labels.astype(np.int16)
+    for g in range(len(db)):
+        h = hashlib.blake2b(digest_size=8)
+        h.update(labels[db.node_offsets[g]:db.node_offsets[g + 1]].tobytes())
+        h.update(b'|')
+        h.update(edges[edge_bounds[g]:edge_bounds[g + 1]].tobytes())
+        keys[g] = int.from_bytes(h.digest(), 'little')
+    return keys
+
+class FeatureCache:
+    """Per-pattern files of (graph key -> cell value) with an LRU size limit."""
+
+    def __init__(self, cache_dir, max_bytes, namespace='binary'):
+        self.dir = os.path.join(cache_dir, namespace)
+        self.max_bytes = max_bytes
+        os.makedirs(self.dir, exist_ok=True)
+
+    def _path(self, pattern_key):
+        return os.path.join(self.dir, f"{int(pattern_key):016x}.npz")
+
+    def lookup(self, g_keys, p_keys):
+        """
+        Returns (values, known): cached cells for every (graph, pattern) pair,
+        with known marking the cells the cache had.
+        """
+        values = np.zeros((len(g_keys), len(p_keys)), dtype=np.int64)
+        known = np.zeros((len(g_keys), len(p_keys)), dtype=bool)
+        for j, pk in enumerate(p_keys):
+            path = self._path(pk)
+            if not os.path.exists(path):
+                continue
+            with np.load(path) as data:
+                cached_keys, cached_values = data['graphs'], data['values']
+            if len(cached_keys) == 0:
+                continue
+            pos = np.minimum(np.searchsorted(cached_keys, g_keys), len(cached_keys) - 1)
+            hit = cached_keys[pos] == g_keys
+            values[hit, j] = cached_values[pos[hit]]
+            known[hit, j] = True
+            os.utime(path)
+        return values, known
+
+    def store(self, g_keys, p_keys, matrix):
+        """Merges one column per pattern into its file, then enforces the size limit."""
+        for j, pk in enumerate(p_keys):
+            keys, values = g_keys, matrix[:, j]
+            path = self._path(pk)
+            if os.path.exists(path):
+                with np.load(path) as data:
+                    keys = np.concatenate([g_keys, data['graphs']])
+                    values = np.concatenate([matrix[:, j], data['values']])
+            # np.unique keeps the first occurrence, i.e. this run's value
+            keys, first = np.unique(keys, return_index=True)
+            tmp = path + '.tmp'
+            with open(tmp, 'wb') as f:
+                np.savez(f, graphs=keys, values=values[first].astype(np.uint8))
+            os.replace(tmp, path)
+        self.evict()
+
+    def evict(self):
+        entries = []
+        for name in os.listdir(self.dir):
+            if name.endswith('.npz'):
+                st = os.stat(os.path.join(self.dir, name))
+                entries.append((st.st_mtime, st.st_size, name))
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            os.remove(os.path.join(self.dir, name))
+            total -= size
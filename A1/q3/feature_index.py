@@ -0,0 +1,159 @@
+import sys
+import os
+import hashlib
+import numpy as np
+
+from feature_bits import PackedFeatures, is_binary, load_features
+
+# A feature whose posting list would cover more than 1/BITMAP_DENSITY of the
+# database is stored as a bitmap instead of a list of ids.
+BITMAP_DENSITY = 32
+
+class FeatureIndex:
+    """
+    Inverted index from feature id to the database graphs that contain it.
+
+    Sparse features keep a sorted list of graph ids (stored on disk as
+    deltas); dense features keep a packed bitmap over all graphs.
+    """
+
+    def __init__(self, num_db, kinds, supports, postings, bitmaps):
+        self.num_db = num_db
+        self.kinds = kinds          # 0 = id list, 1 = bitmap
+        self.supports = supports    # number of graphs containing each feature
+        self.postings = postings    # feature -> sorted int64 ids (lists only)
+        self.bitmaps = bitmaps      # feature -> packed uint8 bitmap (bitmaps only)
+
+    @property
+    def num_features(self):
+        return len(self.kinds)
+
+    def candidates(self, query_row):
+        """Sorted ids of graphs containing every feature set in query_row."""
+        features = np.flatnonzero(query_row)
+        if len(features) == 0:
+            return np.arange(self.num_db, dtype=np.int64)
+
+        # Rarest first keeps the running intersection as small as possible
+        features = features[np.argsort(self.supports[features], kind='stable')]
+        first = features[0]
+        if self.kinds[first] == 0:
+            result = self.postings[first]
+        else:
+            result = np.flatnonzero(np.unpackbits(self.bitmaps[first], count=self.num_db))
+
+        for j in features[1:]:
+            if len(result) == 0:
+                break
+            if self.kinds[j] == 0:
+                result = result[np.isin(result, self.postings[j], assume_unique=True)]
+            else:
+                bitmap = self.bitmaps[j]
+                result = result[((bitmap[result >> 3] >> (7 - (result & 7))) & 1) == 1]
+        return result
+
+def build_index(features):
+    """Builds a FeatureIndex from a dense 0/1 matrix or PackedFeatures."""
+    dense = features.unpack() if isinstance(features, PackedFeatures) else features
+    if not is_binary(dense):
+        raise ValueError("the inverted index needs binary features")
+
+    num_db, num_features = dense.shape
+    present = dense.astype(bool)
+    supports = present.sum(axis=0).astype(np.int64)
+    kinds = (supports * BITMAP_DENSITY > num_db).astype(np.int8)
+
+    postings, bitmaps = {}, {}
+    for j in range(num_features):
+        if kinds[j]:
+            bitmaps[j] = np.packbits(present[:, j])
+        else:
+            postings[j] = np.flatnonzero(present[:, j]).astype(np.int64)
+    return FeatureIndex(num_db, kinds, supports, postings, bitmaps)
+
+def source_digest(db_features_path, chunk_bytes=1 << 20):
+    """BLAKE2b of the feature file an index is built from, stored with the index."""
+    h = hashlib.blake2b(digest_size=16)
+    with open(db_features_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_bytes), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+def save_index(index, path, digest=''):
+    lists = [index.postings[j] for j in range(index.num_features) if index.kinds[j] == 0]
+    list_offsets = np.zeros(len(lists) + 1, dtype=np.int64)
+    np.cumsum([len(p) for p in lists], out=list_offsets[1:])
+    # Delta-encode each list (first entry absolute) so the ids compress well
+    deltas = np.concatenate([np.diff(p, prepend=0) for p in lists]) if lists else np.zeros(0)
+
+    maps = [index.bitmaps[j] for j in range(index.num_features) if index.kinds[j] == 1]
+    bitmap_rows = np.stack(maps) if maps else np.zeros((0, (index.num_db + 7) // 8), dtype=np.uint8)
+
+    with open(path, 'wb') as f:
+        np.savez_compressed(
+            f,
+            num_db=np.int64(index.num_db),
+            source_digest=np.array(digest),
+            kinds=index.kinds,
+            supports=index.supports,
+            list_offsets=list_offsets,
+            list_deltas=deltas.astype(np.uint32),
+            bitmaps=bitmap_rows,
+        )
+
+def load_index(path):
+    with np.load(path) as data:
+        num_db = int(data['num_db'])
+        kinds = data['kinds']
+        supports = data['supports']
+        list_offsets = data['list_offsets']
+        deltas = data['list_deltas'].astype(np.int64)
+        bitmap_rows = data['bitmaps']
+
+    # Undo the per-list delta encoding with one global cumsum
+    running = np.cumsum(deltas)
+    starts = list_offsets[:-1]
+    base = np.where(starts > 0, running[np.maximum(starts - 1, 0)] if len(running) else 0, 0)
+    ids = running - np.repeat(base, np.diff(list_offsets))
+
+    postings, bitmaps = {}, {}
+    list_features = np.flatnonzero(kinds == 0)
+    for k, j in enumerate(list_features):
+        postings[int(j)] = ids[list_offsets[k]:list_offsets[k + 1]]
+    for k, j in enumerate(np.flatnonzero(kinds == 1)):
+        bitmaps[int(j)] = bitmap_rows[k]
+    return FeatureIndex(num_db, kinds, supports, postings, bitmaps)
+
+def stored_digest(path):
+    """Source digest saved with the index at path ('' for indexes saved without one)."""
+    with np.load(path) as data:
+        return str(data['source_digest']) if 'source_digest' in data.files else ''
+
+def load_or_build_index(index_path, db_features_path):
+    """
+    Reuses the index at index_path if it was built from the current
+    contents of db_features_path, otherwise (re)builds and saves it.
+    """
+    digest = source_digest(db_features_path)
+    if os.path.exists(index_path):
+        if stored_digest(index_path) == digest:
+            print(f"Loading feature index from {index_path}...")
+            return load_index(index_path)
+        print(f"Feature index at {index_path} was not built from {db_features_path}; rebuilding")
+
+    print(f"Building feature index from {db_features_path}...")
+    index = build_index(load_features(db_features_path))
+    save_index(index, index_path, digest)
+    print(f"Saved feature index to {index_path}")
+    return index
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        print("Usage: python3 feature_index.py <db_features_path> <index_path>")
+        sys.exit(1)
+
+    index = build_index(load_features(sys.argv[1]))
+    save_index(index, sys.argv[2], source_digest(sys.argv[1]))
+    num_bitmaps = int(index.kinds.sum())
+    print(f"Indexed {index.num_db} graphs over {index.num_features} features "
+          f"({index.num_features - num_bitmaps} posting lists, {num_bitmaps} bitmaps)")
@@ -1,49 +1,382 @@
 import sys
+import os
+import argparse
+import tempfile
 import numpy as np
 
-def main():
-    if len(sys.argv) != 4:
-        print("Usage: python3 generate_candidates.py <db_features_path> <query_features_path> <output_path>")
+from feature_bits import PackedFeatures, is_binary, load_features, pack_features, release_pages
+from feature_index import load_or_build_index
+from candidate_lists import BinaryCandidateWriter
+
+ENGINES = ('auto', 'matmul', 'packed', 'compare')
+# Default database rows per block: small enough for a block to stay in cache
+# while a whole query block runs against it
+DB_BLOCK_ROWS = 1 << 16
+# Bytes held per candidate while a query block is gathered: row and column
+# int64 from np.nonzero, plus the sort permutation
+HIT_BYTES = 24
+
+class CandidateWriter:
+    """
+    Buffers formatted 'q # / c #' records and writes them in large chunks.
+    Given num_db, database ids are formatted once up front and looked up per
+    candidate, which is several times cheaper than str() on every id of every
+    list; without it ids are formatted as they come.
+    """
+
+    def __init__(self, f, num_db=None, flush_bytes=1 << 22):
+        self.f = f
+        self.id_strings = None if num_db is None else [str(i) for i in range(num_db)]
+        self.flush_bytes = flush_bytes
+        self.parts = []
+        self.size = 0
+
+    def write(self, qid, candidate_indices):
+        ids = self.id_strings
+        if ids is None:
+            joined = ' '.join(map(str, candidate_indices.tolist()))
+        else:
+            joined = ' '.join([ids[i] for i in candidate_indices.tolist()])
+        record = f"q # {qid}\nc # {joined}\n"
+        self.parts.append(record)
+        self.size += len(record)
+        if self.size >= self.flush_bytes:
+            self.flush()
+
+    def flush(self):
+        if self.parts:
+            self.f.write(''.join(self.parts))
+            self.parts = []
+            self.size = 0
+
+def choose_engine(db_feats, query_feats, engine='auto'):
+    """
+    matmul  - binary dense features, containment as q @ db.T == |q|
+    packed  - binary features as uint64 words, containment as (q & ~db) == 0
+    compare - any dense features (e.g. counts), element-wise q <= db
+    """
+    any_packed = isinstance(db_feats, PackedFeatures) or isinstance(query_feats, PackedFeatures)
+    binary = any_packed or (is_binary(db_feats) and is_binary(query_feats))
+
+    if engine == 'auto':
+        engine = 'packed' if any_packed else ('matmul' if binary else 'compare')
+    if engine in ('matmul', 'packed') and not binary:
+        print(f"Error: the {engine} engine needs binary features")
+        sys.exit(1)
+    if engine == 'compare' and any_packed:
+        print("Error: the compare engine needs dense feature matrices")
         sys.exit(1)
+    return engine
 
-    db_features_path = sys.argv[1]
-    query_features_path = sys.argv[2]
-    output_path = sys.argv[3]
+def prepare_features(feats, engine):
+    if engine == 'packed':
+        return (feats if isinstance(feats, PackedFeatures) else pack_features(feats)).words
+    if engine == 'matmul':
+        # float32 products are exact up to 2**24 features and go through BLAS,
+        # which NumPy's integer matmul does not
+        return np.asarray(feats, dtype=np.float32)
+    return np.asarray(feats)
 
-    print("Loading feature matrices...")
+def prepare_operands(db_feats, query_feats, engine):
+    return prepare_features(db_feats, engine), prepare_features(query_feats, engine)
+
+def block_sizes(num_db, width, engine, mem_bytes, db_block=None):
+    """
+    Picks (query_block, db_block) so the per-block temporaries fit in
+    mem_bytes. width is the number of features (or packed words) per row.
+    db_block defaults to DB_BLOCK_ROWS and the queries get the rest of the
+    budget, so each database block is reused across many queries. Room for
+    the candidate ids is budgeted separately, from the hits actually seen
+    (see candidate_blocks).
+    """
+    if engine == 'packed':
+        cell_bytes = 9 * width
+    elif engine == 'matmul':
+        cell_bytes = 5
+    else:
+        cell_bytes = 2 * width
+    if db_block is None:
+        db_block = DB_BLOCK_ROWS
+    db_block = max(1, min(db_block, num_db, mem_bytes // cell_bytes))
+    query_block = max(1, mem_bytes // (cell_bytes * db_block))
+    return query_block, db_block
+
+def containment_block(q_block, db_block, engine):
+    """(len(q_block), len(db_block)) bool mask of db rows containing each query."""
+    if engine == 'packed':
+        return np.all((q_block[:, None, :] & ~db_block[None, :, :]) == 0, axis=2)
+    if engine == 'matmul':
+        return (q_block @ db_block.T) == q_block.sum(axis=1)[:, None]
+    return np.all(q_block[:, None, :] <= db_block[None, :, :], axis=2)
+
+def candidate_blocks(db, queries, engine, query_block, db_block, mem_bytes=None):
+    """
+    Yields (first_query_id, candidate lists) for consecutive blocks of
+    queries. Each list holds the ascending db indices of one query's candidates.
+    With mem_bytes, query blocks also shrink so their candidate ids
+    (HIT_BYTES each) fit in it: the first block assumes every row is a
+    candidate, later ones go by the mean candidates per query so far.
+    """
+    num_db = db.shape[0]
+    num_queries = queries.shape[0]
+    hits_seen = queries_seen = 0
+    q_start = 0
+    while q_start < num_queries:
+        size = query_block
+        if mem_bytes is not None:
+            per_query = num_db if queries_seen == 0 else -(-hits_seen // queries_seen)
+            size = max(1, min(query_block, mem_bytes // (HIT_BYTES * max(per_query, 1))))
+        q_block = queries[q_start:q_start + size]
+        rows, cols = [], []
+        for d_start in range(0, num_db, db_block):
+            hit = containment_block(q_block, db[d_start:d_start + db_block], engine)
+            r, c = np.nonzero(hit)
+            rows.append(r)
+            cols.append(c + d_start)
+
+        rows = np.concatenate(rows) if rows else np.zeros(0, dtype=np.int64)
+        cols = np.concatenate(cols) if cols else np.zeros(0, dtype=np.int64)
+        # db blocks arrive in order, so a stable sort on the query keeps ids ascending
+        order = np.argsort(rows, kind='stable')
+        rows, cols = rows[order], cols[order]
+        bounds = np.searchsorted(rows, np.arange(len(q_block) + 1))
+        hits_seen += len(rows)
+        queries_seen += len(q_block)
+        yield q_start, [cols[bounds[k]:bounds[k + 1]] for k in range(len(q_block))]
+        q_start += len(q_block)
+
+def chunked_candidate_blocks(db_feats, query_feats, engine, chunk_rows, mem_bytes, spill_dir):
+    """
+    Out-of-core variant of candidate_blocks for a (memory-mapped) database.
+
+    The database is read once, chunk_rows rows at a time. Each chunk is
+    filtered against all queries and its candidate ids are spilled to a file
+    under spill_dir; the spills are then merged per query, in chunk order, so
+    every list comes out ascending. Only one chunk is resident at a time.
+    """
+    num_db = db_feats.shape[0]
+    num_queries = query_feats.shape[0]
+    spills = []
+
+    for c, d_start in enumerate(range(0, num_db, chunk_rows)):
+        chunk = db_feats[d_start:d_start + chunk_rows]
+        chunk_engine = choose_engine(chunk, query_feats, engine)
+        db, queries = prepare_operands(chunk, query_feats, chunk_engine)
+        query_block, db_block = block_sizes(len(db), db.shape[1], chunk_engine, mem_bytes)
+
+        counts = np.zeros(num_queries, dtype=np.int64)
+        spill_path = os.path.join(spill_dir, f"chunk{c}.bin")
+        with open(spill_path, 'wb') as f:
+            for q_start, lists in candidate_blocks(db, queries, chunk_engine, query_block, db_block,
+                                                   mem_bytes):
+                counts[q_start:q_start + len(lists)] = [len(l) for l in lists]
+                if lists:
+                    (np.concatenate(lists) + d_start).astype(np.int64).tofile(f)
+        spills.append((spill_path, np.concatenate([[0], np.cumsum(counts)])))
+
+        del chunk, db
+        release_pages(db_feats)
+        print(f"Filtered database rows {min(d_start + chunk_rows, num_db)}/{num_db}...", end='\r')
+
+    # Merge as many queries at a time as keep the gathered ids under mem_bytes
+    totals = np.zeros(num_queries + 1, dtype=np.int64)
+    for _, offsets in spills:
+        totals += offsets
+    q_start = 0
+    while q_start < num_queries:
+        q_end = int(np.searchsorted(totals, totals[q_start] + mem_bytes // 8, side='right')) - 1
+        q_end = min(max(q_end, q_start + 1), num_queries)
+        pieces = []
+        for spill_path, offsets in spills:
+            lo, hi = offsets[q_start], offsets[q_end]
+            ids = np.fromfile(spill_path, dtype=np.int64, count=hi - lo, offset=lo * 8)
+            pieces.append(np.split(ids, offsets[q_start + 1:q_end] - lo))
+        lists = [np.concatenate([p[k] for p in pieces]) if pieces else np.zeros(0, dtype=np.int64)
+                 for k in range(q_end - q_start)]
+        yield q_start, lists
+        q_start = q_end
+
+def index_candidate_blocks(index, queries, query_block=1024):
+    """Same contract as candidate_blocks, answered from an inverted index."""
+    num_queries = queries.shape[0]
+    for q_start in range(0, num_queries, query_block):
+        q_block = queries[q_start:q_start + query_block]
+        if isinstance(q_block, PackedFeatures):
+            q_block = q_block.unpack()
+        yield q_start, [index.candidates(row) for row in q_block]
+
+def unique_queries(query_feats):
+    """
+    Returns (distinct rows in first-occurrence order, inverse) with
+    distinct[inverse] equal to query_feats row for row. Isomorphic query
+    graphs have identical feature rows, and identical rows identical
+    candidate lists, so filtering the distinct rows is enough.
+    """
+    packed = isinstance(query_feats, PackedFeatures)
+    rows = query_feats.words if packed else np.asarray(query_feats)
+    if len(rows) == 0:
+        return query_feats, np.zeros(0, dtype=np.int64)
+    _, first, inverse = np.unique(rows, axis=0, return_index=True, return_inverse=True)
+    order = np.argsort(first)
+    rank = np.empty_like(order)
+    rank[order] = np.arange(len(order))
+    picks = first[order]
+    distinct = PackedFeatures(rows[picks], query_feats.num_features) if packed else rows[picks]
+    return distinct, rank[inverse.reshape(-1)]
+
+def fan_out_blocks(inverse, blocks, out_block=1024):
+    """
+    Turns candidate blocks over the distinct queries of unique_queries back
+    into blocks over every query, in the original order. A distinct query's
+    list is held only until its last repeat has been emitted.
+    """
+    last = np.zeros(int(inverse.max()) + 1 if len(inverse) else 0, dtype=np.int64)
+    np.maximum.at(last, inverse, np.arange(len(inverse)))
+    distinct_lists = (c for _, lists in blocks for c in lists)
+    held = {}
+    out, out_start = [], 0
+    for q, u in enumerate(inverse.tolist()):
+        if u not in held:
+            # Distinct queries are numbered by first occurrence, so u is next
+            held[u] = next(distinct_lists)
+        out.append(held[u])
+        if last[u] == q:
+            del held[u]
+        if len(out) == out_block:
+            yield out_start, out
+            out, out_start = [], q + 1
+    if out:
+        yield out_start, out
+
+def dedup_queries(query_feats):
+    """unique_queries, or (query_feats, None) when every row is distinct."""
+    distinct, inverse = unique_queries(query_feats)
+    if len(distinct) == query_feats.shape[0]:
+        return query_feats, None
+    print(f"Deduplicated queries: {len(distinct)} distinct of {query_feats.shape[0]}")
+    return distinct, inverse
+
+def filter_with_index(args):
     try:
-        db_feats = np.load(db_features_path)
-        query_feats = np.load(query_features_path)
+        query_feats = load_features(args.query_features_path)
+        index = load_or_build_index(args.index, args.db_features_path)
     except Exception as e:
-        print(f"Error loading numpy files: {e}")
+        print(f"Error loading features or index: {e}")
         sys.exit(1)
 
+    if index.num_features != query_feats.shape[1]:
+        print(f"Error: feature count mismatch ({index.num_features} vs {query_feats.shape[1]})")
+        sys.exit(1)
+    if isinstance(query_feats, PackedFeatures):
+        query_feats = query_feats.unpack()
+
     num_queries = query_feats.shape[0]
-    num_db = db_feats.shape[0]
-    
-    print(f"Processing {num_queries} queries against {num_db} database graphs...")
+    inverse = None
+    if not args.no_dedup:
+        query_feats, inverse = dedup_queries(query_feats)
+    print(f"Processing {num_queries} queries against {index.num_db} database graphs (inverted index)...")
+    blocks = index_candidate_blocks(index, query_feats)
+    return index.num_db, num_queries, blocks if inverse is None else fan_out_blocks(inverse, blocks)
 
+def write_candidates(output_path, num_db, num_queries, blocks, binary=False, id_table=True):
+    """
+    Text 'q # / c #' records, or with binary the .cand format of
+    candidate_lists.py. id_table=False skips the preformatted id strings
+    of the text writer to keep memory flat.
+    """
     try:
-        with open(output_path, 'w') as f:
-            for i in range(num_queries):
-                q_vec = query_feats[i]
-                
-                comparison = (q_vec <= db_feats)
-                candidates_mask = np.all(comparison, axis=1)
-                
-                candidate_indices = np.where(candidates_mask)[0]
-                
-                candidates_str = " ".join(map(str, candidate_indices))
-                
-                f.write(f"q # {i}\n")
-                f.write(f"c # {candidates_str}\n")
-                
-                if i % 100 == 0:
-                    print(f"Processed {i}/{num_queries} queries...", end='\r')
+        with open(output_path, 'wb' if binary else 'w') as f:
+            if binary:
+                writer = BinaryCandidateWriter(f, num_db)
+            else:
+                writer = CandidateWriter(f, num_db if id_table else None)
+            for q_start, lists in blocks:
+                for k, candidate_indices in enumerate(lists):
+                    writer.write(q_start + k, candidate_indices)
+                print(f"Processed {q_start + len(lists)}/{num_queries} queries...", end='\r')
+            if binary:
+                writer.close()
+            else:
+                writer.flush()
 
     except IOError as e:
         print(f"Error writing to output file: {e}")
         sys.exit(1)
 
+def main():
+    parser = argparse.ArgumentParser(
+        usage="python3 generate_candidates.py <db_features_path> <query_features_path> <output_path>")
+    parser.add_argument('db_features_path')
+    parser.add_argument('query_features_path')
+    parser.add_argument('output_path')
+    parser.add_argument('--engine', choices=ENGINES, default='auto',
+                        help="Containment test used for filtering")
+    parser.add_argument('--mem-mb', type=int, default=64,
+                        help="Ceiling for the per-block temporaries, and separately for the "
+                             "candidate ids gathered per query block, in MB")
+    parser.add_argument('--db-block', type=int, default=None,
+                        help=f"Database rows per block (default: {DB_BLOCK_ROWS}, fewer if "
+                             f"--mem-mb requires)")
+    parser.add_argument('--chunk-rows', type=int, default=None,
+                        help="Memory-map the database and filter it this many rows at a time")
+    parser.add_argument('--spill-dir', default=None,
+                        help="Directory for per-chunk candidate spills (default: next to the output)")
+    parser.add_argument('--index', default=None,
+                        help="Answer queries from the inverted index at this path (built from the db features if missing)")
+    parser.add_argument('--no-dedup', action='store_true',
+                        help="Filter repeated query rows again instead of once per distinct row")
+    parser.add_argument('--binary', action='store_true',
+                        help="Write delta-varint/bitmap encoded lists (see candidate_lists.py) instead of text")
+    args = parser.parse_args()
+
+    if args.index:
+        num_db, num_queries, blocks = filter_with_index(args)
+        write_candidates(args.output_path, num_db, num_queries, blocks, args.binary)
+        return
+
+    print("Loading feature matrices...")
+    try:
+        db_feats = load_features(args.db_features_path,
+                                 mmap_mode='r' if args.chunk_rows else None)
+        query_feats = load_features(args.query_features_path)
+    except Exception as e:
+        print(f"Error loading numpy files: {e}")
+        sys.exit(1)
+
+    if db_feats.shape[1] != query_feats.shape[1]:
+        print(f"Error: feature count mismatch ({db_feats.shape[1]} vs {query_feats.shape[1]})")
+        sys.exit(1)
+
+    num_queries = query_feats.shape[0]
+    num_db = db_feats.shape[0]
+    inverse = None
+    if not args.no_dedup:
+        query_feats, inverse = dedup_queries(query_feats)
+
+    def in_query_order(blocks):
+        return blocks if inverse is None else fan_out_blocks(inverse, blocks)
+
+    if args.chunk_rows:
+        print(f"Processing {num_queries} queries against {num_db} database graphs "
+              f"(chunks of {args.chunk_rows} rows)...")
+        spill_dir = args.spill_dir or os.path.dirname(os.path.abspath(args.output_path))
+        with tempfile.TemporaryDirectory(dir=spill_dir) as tmp:
+            blocks = in_query_order(chunked_candidate_blocks(
+                db_feats, query_feats, args.engine, args.chunk_rows, args.mem_mb << 20, tmp))
+            write_candidates(args.output_path, num_db, num_queries, blocks, args.binary,
+                             id_table=False)
+        return
+
+    engine = choose_engine(db_feats, query_feats, args.engine)
+    db, queries = prepare_operands(db_feats, query_feats, engine)
+    query_block, db_block = block_sizes(num_db, db.shape[1], engine,
+                                        args.mem_mb << 20, args.db_block)
+
+    print(f"Processing {num_queries} queries against {num_db} database graphs "
+          f"({engine}, blocks of {query_block} x {db_block})...")
+
+    blocks = candidate_blocks(db, queries, engine, query_block, db_block, args.mem_mb << 20)
+    write_candidates(args.output_path, num_db, num_queries, in_query_order(blocks), args.binary)
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,339 @@
+import os
+import sys
+import json
+import argparse
+import numpy as np
+import networkx as nx
+from array import array
+
+LABEL_MAPPING = {
+    'Br': 0, 'C': 1, 'Cl': 2, 'F': 3, 'H': 4,
+    'I': 5, 'N': 6, 'O': 7, 'P': 8, 'S': 9, 'Si': 10
+}
+
+# Binary form: a directory holding one .npy file per GraphDB array, opened
+# with mmap so loading costs a few page faults instead of a text parse.
+# Labels are stored already mapped, so the text format flag no longer applies.
+GRAPH_DB_ARRAYS = ('node_labels', 'node_offsets', 'adj_offsets', 'adj_indices', 'adj_labels')
+# Raw-label table saved next to the arrays: {"node": {id: raw label}, "edge": {...}}
+LABEL_TABLE = 'labels.json'
+
+class GraphDB:
+    """
+    A whole graph database held in flat NumPy arrays (CSR layout).
+
+    node_labels  [total_nodes]       label of every node, graph after graph
+    node_offsets [num_graphs + 1]    graph g owns nodes node_offsets[g]:node_offsets[g+1]
+    adj_offsets  [total_nodes + 1]   CSR row pointers into adj_indices / adj_labels
+    adj_indices  [2 * total_edges]   neighbour of each adjacency entry (global node index)
+    adj_labels   [2 * total_edges]   bond label of each adjacency entry
+
+    Indexing with an int builds the networkx graph for that molecule on demand;
+    indexing with a slice returns a smaller GraphDB.
+    """
+
+    def __init__(self, node_labels, node_offsets, adj_offsets, adj_indices, adj_labels):
+        self.node_labels = node_labels
+        self.node_offsets = node_offsets
+        self.adj_offsets = adj_offsets
+        self.adj_indices = adj_indices
+        self.adj_labels = adj_labels
+
+    def __len__(self):
+        return len(self.node_offsets) - 1
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            start, stop, step = key.indices(len(self))
+            if step != 1:
+                raise ValueError("GraphDB only supports contiguous slices")
+            return self.subset(start, max(start, stop))
+        if key < 0: key += len(self)
+        return self.to_networkx(key)
+
+    def __iter__(self):
+        for g in range(len(self)):
+            yield self.to_networkx(g)
+
+    @property
+    def total_nodes(self):
+        return len(self.node_labels)
+
+    def degrees(self):
+        return np.diff(self.adj_offsets)
+
+    def graph_of_node(self):
+        return np.repeat(np.arange(len(self), dtype=np.int64), np.diff(self.node_offsets))
+
+    def num_nodes(self, g):
+        return int(self.node_offsets[g + 1] - self.node_offsets[g])
+
+    def subset(self, start, stop):
+        n_lo, n_hi = self.node_offsets[start], self.node_offsets[stop]
+        a_lo, a_hi = self.adj_offsets[n_lo], self.adj_offsets[n_hi]
+        return GraphDB(
+            self.node_labels[n_lo:n_hi].copy(),
+            self.node_offsets[start:stop + 1] - n_lo,
+            self.adj_offsets[n_lo:n_hi + 1] - a_lo,
+            self.adj_indices[a_lo:a_hi] - n_lo,
+            self.adj_labels[a_lo:a_hi].copy(),
+        )
+
+    def take(self, graph_ids):
+        """A new GraphDB holding the given graphs, in the given order."""
+        graph_ids = np.asarray(graph_ids, dtype=np.int64)
+        n_starts = self.node_offsets[graph_ids]
+        n_counts = self.node_offsets[graph_ids + 1] - n_starts
+        node_offsets = np.concatenate([[0], np.cumsum(n_counts)]).astype(np.int64)
+        old_nodes = _ranges(n_starts, n_counts)
+
+        a_starts = self.adj_offsets[old_nodes]
+        a_counts = self.adj_offsets[old_nodes + 1] - a_starts
+        adj_offsets = np.concatenate([[0], np.cumsum(a_counts)]).astype(np.int64)
+        old_entries = _ranges(a_starts, a_counts)
+
+        # Shift neighbour ids from each graph's old node range to its new one
+        shift = np.repeat(node_offsets[:-1] - n_starts, n_counts)
+        adj_indices = self.adj_indices[old_entries] + np.repeat(shift, a_counts)
+        return GraphDB(self.node_labels[old_nodes], node_offsets, adj_offsets,
+                       adj_indices, self.adj_labels[old_entries])
+
+    def to_networkx(self, g):
+        lo, hi = int(self.node_offsets[g]), int(self.node_offsets[g + 1])
+        G = nx.Graph()
+        labels = self.node_labels[lo:hi].tolist()
+        for k, lbl in enumerate(labels):
+            G.add_node(k, label=lbl)
+
+        a_lo, a_hi = int(self.adj_offsets[lo]), int(self.adj_offsets[hi])
+        nbrs = (self.adj_indices[a_lo:a_hi] - lo).tolist()
+        elbls = self.adj_labels[a_lo:a_hi].tolist()
+        ptr = (self.adj_offsets[lo:hi + 1] - a_lo).tolist()
+        for k in range(hi - lo):
+            for p in range(ptr[k], ptr[k + 1]):
+                if nbrs[p] >= k:
+                    G.add_edge(k, nbrs[p], label=elbls[p])
+        return G
+
+def _ranges(starts, counts):
+    """Concatenation of arange(s, s + c) for every (s, c) pair."""
+    total = int(counts.sum())
+    if total == 0:
+        return np.zeros(0, dtype=np.int64)
+    base = np.repeat(starts - (np.cumsum(counts) - counts), counts)
+    return base + np.arange(total, dtype=np.int64)
+
+def build_graph_db(node_labels, node_offsets, edge_src, edge_dst, edge_labels):
+    """
+    Assembles a GraphDB from flat per-node labels and an edge list given in
+    global node indices. Repeated edges keep their last label, as nx.Graph would.
+    """
+    node_labels = np.asarray(node_labels, dtype=np.int16)
+    node_offsets = np.asarray(node_offsets, dtype=np.int64)
+    src = np.asarray(edge_src, dtype=np.int64)
+    dst = np.asarray(edge_dst, dtype=np.int64)
+    elbl = np.asarray(edge_labels, dtype=np.int16)
+    total_nodes = len(node_labels)
+
+    if len(src):
+        lo, hi = np.minimum(src, dst), np.maximum(src, dst)
+        key = lo * max(total_nodes, 1) + hi
+        # Last occurrence of each undirected edge, kept in file order
+        _, last_rev = np.unique(key[::-1], return_index=True)
+        keep = np.sort(len(key) - 1 - last_rev)
+        lo, hi, elbl = lo[keep], hi[keep], elbl[keep]
+
+        loop = lo == hi
+        rows = np.concatenate([lo, hi[~loop]])
+        cols = np.concatenate([hi, lo[~loop]])
+        labs = np.concatenate([elbl, elbl[~loop]])
+        order = np.argsort(rows, kind='stable')
+        rows, cols, labs = rows[order], cols[order], labs[order]
+    else:
+        rows = cols = np.zeros(0, dtype=np.int64)
+        labs = np.zeros(0, dtype=np.int16)
+
+    adj_offsets = np.zeros(total_nodes + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=total_nodes), out=adj_offsets[1:])
+
+    return GraphDB(node_labels, node_offsets, adj_offsets, cols, labs)
+
+def parse_label(raw_label, is_gspan_format=False):
+    if is_gspan_format or raw_label.isdigit():
+        return int(raw_label)
+    return LABEL_MAPPING.get(raw_label, -1)
+
+def save_graph_db(db, dir_path, node_names=None):
+    """
+    Writes the arrays and LABEL_TABLE; node_names maps raw node labels to
+    their ids (see load_graph_db), otherwise ids stand for themselves.
+    """
+    os.makedirs(dir_path, exist_ok=True)
+    for name in GRAPH_DB_ARRAYS:
+        np.save(os.path.join(dir_path, name + '.npy'), getattr(db, name))
+    if node_names is None:
+        node_names = {str(l): l for l in np.unique(db.node_labels).tolist()}
+    table = {'node': {str(l): raw for raw, l in node_names.items()},
+             'edge': {str(l): str(l) for l in np.unique(db.adj_labels).tolist()}}
+    with open(os.path.join(dir_path, LABEL_TABLE), 'w') as f:
+        json.dump(table, f)
+
+def _remap_labels(values, names, parse, kind):
+    """
+    Translates stored label ids through a LABEL_TABLE section ({id: raw
+    label}) into q3's ids, as parse gives them. Returns values untouched
+    (still memory-mapped) when the table already uses q3's ids.
+    """
+    ids = np.array([int(i) for i in names], dtype=np.int64)
+    mapped = []
+    for raw in names.values():
+        try:
+            label = parse(raw)
+        except ValueError:
+            label = -1
+        if label == -1 and raw != '-1':
+            raise ValueError(f"{kind} label {raw!r} has no id in q3")
+        mapped.append(label)
+    mapped = np.array(mapped, dtype=np.int64)
+    if np.array_equal(ids, mapped):
+        return values
+
+    order = np.argsort(ids)
+    ids, mapped = ids[order], mapped[order]
+    pos = np.minimum(np.searchsorted(ids, values), max(len(ids) - 1, 0))
+    if len(values) and (not len(ids) or (ids[pos] != values).any()):
+        raise ValueError(f"{kind} label ids missing from {LABEL_TABLE}")
+    if len(mapped) and np.abs(mapped).max() > np.iinfo(np.int16).max:
+        raise ValueError(f"{kind} labels do not fit q3's int16 ids")
+    return mapped[pos].astype(np.int16)
+
+def open_graph_db(dir_path, mmap_mode='r'):
+    """
+    Opens a directory written by save_graph_db or q2's save_binary_dataset,
+    memory-mapped by default. Label ids are translated to q3's through the
+    raw labels in LABEL_TABLE, so a q2 directory numbered in first-seen
+    order reads the same as a q3 one.
+    """
+    db = GraphDB(*(np.load(os.path.join(dir_path, name + '.npy'), mmap_mode=mmap_mode)
+                   for name in GRAPH_DB_ARRAYS))
+    table_path = os.path.join(dir_path, LABEL_TABLE)
+    if os.path.exists(table_path):
+        with open(table_path) as f:
+            table = json.load(f)
+        db.node_labels = _remap_labels(db.node_labels, table['node'], parse_label, 'node')
+        db.adj_labels = _remap_labels(db.adj_labels, table['edge'], int, 'edge')
+    return db
+
+def load_graph_db(file_path, is_gspan_format=False, node_names=None):
+    """
+    Reads a graph dump in one streaming pass straight into flat arrays.
+    Accepts the same '#', 't #' and 'Graph' headers as the networkx loaders,
+    or a binary directory (see open_graph_db), which is opened in place.
+    node_names, if given, collects raw node label -> id for every label read.
+    """
+    if os.path.isdir(file_path):
+        return open_graph_db(file_path)
+
+    node_labels = array('h')
+    node_offsets = array('q', [0])
+    src, dst, elbl = array('q'), array('q'), array('h')
+    local_ids = {}
+    started = False
+
+    with open(file_path, 'r') as f:
+        for line in f:
+            line = line.strip()
+            if not line: continue
+
+            if line.startswith('#') or line.startswith('t #') or line.startswith('Graph'):
+                if started:
+                    node_offsets.append(len(node_labels))
+                local_ids = {}
+                started = True
+                continue
+
+            started = True
+            parts = line.split()
+
+            if parts[0] == 'v':
+                node_id = int(parts[1])
+                label = parse_label(parts[2], is_gspan_format)
+                if node_names is not None:
+                    node_names[parts[2]] = label
+                if node_id not in local_ids:
+                    local_ids[node_id] = len(node_labels)
+                    node_labels.append(label)
+                else:
+                    node_labels[local_ids[node_id]] = label
+
+            elif parts[0] == 'e':
+                ends = []
+                for node_id in (int(parts[1]), int(parts[2])):
+                    if node_id not in local_ids:
+                        local_ids[node_id] = len(node_labels)
+                        node_labels.append(-1)
+                    ends.append(local_ids[node_id])
+                src.append(ends[0])
+                dst.append(ends[1])
+                elbl.append(int(parts[3]))
+
+    if started:
+        node_offsets.append(len(node_labels))
+
+    return build_graph_db(
+        np.frombuffer(node_labels, dtype=np.int16) if node_labels else [],
+        np.frombuffer(node_offsets, dtype=np.int64),
+        np.frombuffer(src, dtype=np.int64) if src else [],
+        np.frombuffer(dst, dtype=np.int64) if dst else [],
+        np.frombuffer(elbl, dtype=np.int16) if elbl else [],
+    )
+
+def graph_db_from_networkx(graphs):
+    """Packs a list of labelled nx.Graphs (e.g. mined patterns) into a GraphDB."""
+    node_labels, node_offsets = [], [0]
+    src, dst, elbl = [], [], []
+    for G in graphs:
+        base = len(node_labels)
+        index = {n: base + k for k, n in enumerate(G.nodes)}
+        node_labels.extend(G.nodes[n].get('label', -1) for n in G.nodes)
+        for u, v, data in G.edges(data=True):
+            src.append(index[u])
+            dst.append(index[v])
+            elbl.append(data.get('label', -1))
+        node_offsets.append(len(node_labels))
+    return build_graph_db(node_labels, node_offsets, src, dst, elbl)
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Convert a text graph dump to the binary GraphDB directory format, once")
+    parser.add_argument('input_path')
+    parser.add_argument('output_dir')
+    parser.add_argument('--gspan', action='store_true',
+                        help="Labels are already integers (e.g. mined subgraph files)")
+    args = parser.parse_args()
+
+    node_names = {}
+    try:
+        db = load_graph_db(args.input_path, is_gspan_format=args.gspan, node_names=node_names)
+    except (IOError, ValueError) as e:
+        print(f"Error converting {args.input_path}: {e}")
+        sys.exit(1)
+
+    if db.total_nodes == 0:
+        print(f"Error: no 'v' lines parsed from {args.input_path}; for the q2 block format "
+              f"(node and edge counts) use A1/q2/to_binary.py")
+        sys.exit(1)
+    unknown = sorted(raw for raw, label in node_names.items() if label == -1)
+    if unknown:
+        print(f"Error: labels outside LABEL_MAPPING would all become -1: {', '.join(unknown[:10])}")
+        sys.exit(1)
+
+    try:
+        save_graph_db(db, args.output_dir, node_names or None)
+    except (IOError, ValueError) as e:
+        print(f"Error converting {args.input_path}: {e}")
+        sys.exit(1)
+    print(f"Wrote {len(db)} graphs ({db.total_nodes} nodes) to {args.output_dir}")
+
+if __name__ == "__main__":
+    main()
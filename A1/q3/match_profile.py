@@ -0,0 +1,132 @@
+import csv
+import json
+import time
+from array import array
+import numpy as np
+
+# Opt-in cost profile of generate_features: one record per subgraph test,
+# aggregated per pattern and per graph-size bucket when the report is written.
+
+PERCENTILES = (50, 90, 99)
+
+class MatchProfile:
+    """Timed subgraph tests as flat arrays: graph id, pattern, graph size, seconds, result."""
+
+    def __init__(self):
+        self.graph = array('q')
+        self.pattern = array('q')
+        self.nodes = array('q')
+        self.seconds = array('d')
+        self.hit = array('b')
+        self._graph_id = 0
+        self._graph_nodes = 0
+
+    def __len__(self):
+        return len(self.seconds)
+
+    def set_graph(self, g, num_nodes):
+        """Graph the following wrapped tests run against."""
+        self._graph_id = g
+        self._graph_nodes = num_nodes
+
+    def wrap(self, contains, patterns):
+        """A contains() that records the cost of every call into this profile."""
+        index = {id(p): j for j, p in enumerate(patterns)}
+
+        def timed(graph, pattern):
+            start = time.perf_counter()
+            value = contains(graph, pattern)
+            self.seconds.append(time.perf_counter() - start)
+            self.graph.append(self._graph_id)
+            self.pattern.append(index[id(pattern)])
+            self.nodes.append(self._graph_nodes)
+            self.hit.append(1 if value else 0)
+            return value
+        return timed
+
+    def records(self):
+        return (self.graph, self.pattern, self.nodes, self.seconds, self.hit)
+
+    def remap(self, graph_ids, pattern_ids):
+        """Translates recorded graph and pattern positions through the given id arrays."""
+        self.graph = array('q', np.asarray(graph_ids, dtype=np.int64)[np.asarray(self.graph)].tobytes())
+        self.pattern = array('q', np.asarray(pattern_ids, dtype=np.int64)[np.asarray(self.pattern)].tobytes())
+
+    def extend(self, records):
+        """Appends records() from another profile, e.g. a worker's."""
+        for mine, theirs in zip(self.records(), records):
+            mine.extend(theirs)
+
+def size_bucket(num_nodes):
+    """Graph-size buckets by powers of two: 1, 2-3, 4-7, 8-15, ..."""
+    lo = 1 << max(int(num_nodes).bit_length() - 1, 0)
+    return f"{lo}-{2 * lo - 1}" if lo > 1 else f"{lo}"
+
+def _summary(seconds, hits):
+    row = {'calls': int(len(seconds)),
+           'total_s': float(seconds.sum()),
+           'mean_s': float(seconds.mean()) if len(seconds) else 0.0,
+           'max_s': float(seconds.max()) if len(seconds) else 0.0,
+           'hit_rate': float(hits.mean()) if len(hits) else 0.0}
+    for p in PERCENTILES:
+        row[f'p{p}_s'] = float(np.percentile(seconds, p)) if len(seconds) else 0.0
+    return row
+
+def build_report(profile, worst=20):
+    """
+    Per-pattern and per-size-bucket cost summaries plus the worst individual
+    (graph, pattern) tests. hit_rate is the share of tests that found the
+    pattern, so patterns that are both costly and almost always present
+    (little pruning) stand out.
+    """
+    graph, pattern, nodes, seconds, hit = (np.asarray(a) for a in profile.records())
+
+    patterns = []
+    for j in np.unique(pattern):
+        sel = pattern == j
+        patterns.append(dict(pattern=int(j), **_summary(seconds[sel], hit[sel])))
+    patterns.sort(key=lambda r: -r['total_s'])
+
+    buckets = []
+    keys = np.array([size_bucket(n) for n in nodes.tolist()])
+    for lo in sorted({int(k.split('-')[0]) for k in keys.tolist()}):
+        name = size_bucket(lo)
+        sel = keys == name
+        buckets.append(dict(bucket=name, **_summary(seconds[sel], hit[sel])))
+
+    top = np.argsort(-seconds, kind='stable')[:worst]
+    pairs = [{'graph': int(graph[k]), 'pattern': int(pattern[k]), 'nodes': int(nodes[k]),
+              'seconds': float(seconds[k]), 'hit': bool(hit[k])} for k in top]
+
+    return {'overall': _summary(seconds, hit), 'patterns': patterns,
+            'size_buckets': buckets, 'worst_pairs': pairs}
+
+def write_report(profile, path, worst=20):
+    """Writes JSON, or one flat CSV with a section column when path ends in .csv."""
+    report = build_report(profile, worst)
+    if path.endswith('.csv'):
+        columns = ['section', 'pattern', 'bucket', 'graph', 'nodes', 'calls', 'total_s',
+                   'mean_s'] + [f'p{p}_s' for p in PERCENTILES] + ['max_s', 'hit_rate',
+                                                                   'seconds', 'hit']
+        with open(path, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=columns)
+            writer.writeheader()
+            for section, key in (('pattern', 'patterns'), ('bucket', 'size_buckets'),
+                                 ('pair', 'worst_pairs')):
+                for row in report[key]:
+                    writer.writerow(dict(section=section, **row))
+    else:
+        with open(path, 'w') as f:
+            json.dump(report, f, indent=2)
+    return report
+
+def print_summary(report, top=5):
+    overall = report['overall']
+    print(f"\nProfile: {overall['calls']} tests, {overall['total_s']:.3f}s matching, "
+          f"p99 {overall['p99_s'] * 1e3:.3f}ms")
+    for row in report['patterns'][:top]:
+        print(f"  pattern {row['pattern']}: {row['total_s']:.3f}s over {row['calls']} tests, "
+              f"p99 {row['p99_s'] * 1e3:.3f}ms, hit rate {row['hit_rate']:.2f}")
+    for row in report['worst_pairs'][:top]:
+        print(f"  worst: graph {row['graph']} ({row['nodes']} nodes) x pattern {row['pattern']}: "
+              f"{row['seconds'] * 1e3:.3f}ms")
@@ -1,43 +1,13 @@
-import sys
+import argparse
 import networkx as nx
+import numpy as np
 import collections
-import itertools
 
-LABEL_MAPPING = {
-    'Br': 0, 'C': 1, 'Cl': 2, 'F': 3, 'H': 4, 
-    'I': 5, 'N': 6, 'O': 7, 'P': 8, 'S': 9, 'Si': 10
-}
+from graph_db import LABEL_MAPPING, load_graph_db
 REVERSE_MAPPING = {v: k for k, v in LABEL_MAPPING.items()}
 
 def load_graphs(file_path):
-    graphs = []
-    current_graph = None
-    with open(file_path, 'r') as f:
-        for line in f:
-            line = line.strip()
-            if not line: continue
-            parts = line.split()
-            
-            if line.startswith('#') or line.startswith('t #') or line.startswith('Graph'):
-                if current_graph: graphs.append(current_graph)
-                current_graph = nx.Graph()
-                continue
-            
-            if current_graph is None: current_graph = nx.Graph()
-            
-            if parts[0] == 'v':
-                nid, lbl = int(parts[1]), parts[2]
-                # Hybrid conversion
-                if lbl.isdigit(): lbl = int(lbl)
-                else: lbl = LABEL_MAPPING.get(lbl, -1)
-                current_graph.add_node(nid, label=lbl)
-                
-            elif parts[0] == 'e':
-                u, v, lbl = int(parts[1]), int(parts[2]), int(parts[3])
-                current_graph.add_edge(u, v, label=lbl)
-                
-    if current_graph: graphs.append(current_graph)
-    return graphs
+    return load_graph_db(file_path)
 
 def get_canon_edge(u_lbl, v_lbl, e_lbl):
     if u_lbl > v_lbl: return (v_lbl, u_lbl, e_lbl)
@@ -46,18 +16,19 @@ def get_canon_edge(u_lbl, v_lbl, e_lbl):
 def mine_features(graphs, top_k=50):
     print(f"Mining features from {len(graphs)} graphs (Python Fallback)...")
     
-    edge_counts = collections.Counter()
-    for G in graphs:
-        seen_edges = set()
-        for u, v, data in G.edges(data=True):
-            elbl = data.get('label', 0)
-            ulbl = G.nodes[u].get('label', 0)
-            vlbl = G.nodes[v].get('label', 0)
-            
-            canon = get_canon_edge(ulbl, vlbl, elbl)
-            if canon not in seen_edges:
-                edge_counts[canon] += 1
-                seen_edges.add(canon)
+    # One (graph, canonical edge) entry per undirected edge, straight off the CSR arrays
+    src = np.repeat(np.arange(graphs.total_nodes, dtype=np.int64), graphs.degrees())
+    once = src <= graphs.adj_indices
+    u_lbl = graphs.node_labels[src[once]]
+    v_lbl = graphs.node_labels[graphs.adj_indices[once]]
+    e_lbl = graphs.adj_labels[once]
+    gid = graphs.graph_of_node()[src[once]]
+    canon = np.stack([np.minimum(u_lbl, v_lbl), np.maximum(u_lbl, v_lbl), e_lbl], axis=1)
+
+    # Count each canonical edge at most once per graph, in file order so that
+    # ties in most_common() still go to the edge seen first
+    _, first = np.unique(np.column_stack([gid, canon]), axis=0, return_index=True)
+    edge_counts = collections.Counter(map(tuple, canon[np.sort(first)].tolist()))
                 
     top_patterns = edge_counts.most_common(top_k)
     
@@ -71,6 +42,186 @@ def mine_features(graphs, top_k=50):
         
     return mined_subgraphs
 
+class TreePattern:
+    """
+    A connected, acyclic labelled pattern grown one edge at a time.
+
+    labels      node labels, in the order nodes were added
+    edges       (u, v, edge label) with v the node that edge introduced
+    emb_graph   [m] graph id of each embedding
+    emb_nodes   [m, num_nodes] global node ids each embedding maps to
+    support     number of distinct graphs with at least one embedding
+    """
+
+    def __init__(self, labels, edges, emb_graph, emb_nodes, support):
+        self.labels = labels
+        self.edges = edges
+        self.emb_graph = emb_graph
+        self.emb_nodes = emb_nodes
+        self.support = support
+
+    def to_networkx(self):
+        Sub = nx.Graph()
+        for n, lbl in enumerate(self.labels):
+            Sub.add_node(n, label=int(lbl))
+        for u, v, e_lbl in self.edges:
+            Sub.add_edge(u, v, label=int(e_lbl))
+        return Sub
+
+def canonical_tree_code(labels, edges):
+    """
+    Canonical string of a labelled tree: the smaller encoding over its
+    center(s), each subtree written as (label children...) with children
+    sorted. Two trees get the same code iff they are isomorphic.
+    """
+    adj = collections.defaultdict(list)
+    for u, v, e in edges:
+        adj[u].append((v, e))
+        adj[v].append((u, e))
+
+    # Strip leaves layer by layer to find the center(s)
+    degree = {n: len(adj[n]) for n in range(len(labels))}
+    layer = [n for n, d in degree.items() if d <= 1]
+    remaining = len(labels)
+    while remaining > 2:
+        remaining -= len(layer)
+        nxt = []
+        for leaf in layer:
+            for nb, _ in adj[leaf]:
+                degree[nb] -= 1
+                if degree[nb] == 1:
+                    nxt.append(nb)
+        layer = nxt
+
+    # ',' ends a node label and '(' an edge label, so multi-digit labels
+    # cannot run together
+    def encode(n, parent):
+        children = sorted(f",{e}{encode(c, n)}" for c, e in adj[n] if c != parent)
+        return f"({labels[n]}{''.join(children)})"
+
+    return min(encode(c, -1) for c in layer)
+
+def _edge_table(graphs):
+    """Sorted src * total_nodes + dst keys of every adjacency entry, for _adjacent."""
+    src = np.repeat(np.arange(graphs.total_nodes, dtype=np.int64), graphs.degrees())
+    return np.sort(src * graphs.total_nodes + graphs.adj_indices)
+
+def _adjacent(graphs, table, a, b):
+    """Elementwise: is global node a joined to global node b by an edge?"""
+    keys = a.astype(np.int64) * graphs.total_nodes + b
+    if len(table) == 0:
+        return np.zeros(keys.shape, dtype=bool)
+    pos = np.minimum(np.searchsorted(table, keys), len(table) - 1)
+    return table[pos] == keys
+
+def _grow(graphs, table, pattern, min_support, max_edges, seen, out):
+    """Depth-first rightmost-free growth: extend every node by one new leaf."""
+    out.append(pattern)
+    if len(pattern.edges) >= max_edges:
+        return
+
+    emb_graph, emb_nodes = pattern.emb_graph, pattern.emb_nodes
+    m, k = emb_nodes.shape
+    for i in range(k):
+        u = emb_nodes[:, i]
+        deg = graphs.adj_offsets[u + 1] - graphs.adj_offsets[u]
+        rows = np.repeat(np.arange(m), deg)
+        within = np.arange(len(rows)) - np.repeat(np.cumsum(deg) - deg, deg)
+        ptr = graphs.adj_offsets[u][rows] + within
+        nb = graphs.adj_indices[ptr]
+        fresh = ~(emb_nodes[rows] == nb[:, None]).any(axis=1)
+        # Induced embeddings only: the new node may touch no embedded node but u
+        others = np.delete(emb_nodes[rows], i, axis=1)
+        fresh &= ~_adjacent(graphs, table, others, nb[:, None]).any(axis=1)
+        rows, nb, e_lbl = rows[fresh], nb[fresh], graphs.adj_labels[ptr][fresh]
+        if len(rows) == 0:
+            continue
+
+        n_lbl = graphs.node_labels[nb]
+        key = ((e_lbl.astype(np.int64) + 1) << 16) | (n_lbl.astype(np.int64) + 1)
+        order = np.argsort(key, kind='stable')
+        key, rows, nb = key[order], rows[order], nb[order]
+        bounds = np.flatnonzero(np.diff(key)) + 1
+        for lo, hi in zip(np.r_[0, bounds], np.r_[bounds, len(key)]):
+            child_graphs = emb_graph[rows[lo:hi]]
+            support = len(np.unique(child_graphs))
+            if support < min_support:
+                continue
+            e, l = int(key[lo] >> 16) - 1, int(key[lo] & 0xFFFF) - 1
+            labels = pattern.labels + [l]
+            edges = pattern.edges + [(i, k, e)]
+            code = canonical_tree_code(labels, edges)
+            # The first derivation of a tree already enumerates all of its
+            # embeddings, so later derivations can be dropped unexamined
+            if code in seen:
+                continue
+            seen.add(code)
+            child_nodes = np.column_stack([emb_nodes[rows[lo:hi]], nb[lo:hi]])
+            _grow(graphs, table, TreePattern(labels, edges, child_graphs, child_nodes, support),
+                  min_support, max_edges, seen, out)
+
+def mine_frequent_trees(graphs, min_support=0.1, max_edges=4):
+    """
+    All labelled paths and trees with up to max_edges edges that occur in at
+    least min_support (a fraction) of the graphs, with their support counts.
+    Supports come straight from the embedding lists; no isomorphism test is run.
+    Only induced embeddings are kept, matching the containment test
+    convert.py builds the features with, so a tree's support is its column
+    sum there. Induced support still only shrinks as a tree grows, since
+    every induced embedding restricts to an induced one of its parent.
+    """
+    min_count = max(1, int(np.ceil(min_support * len(graphs))))
+
+    # Single edges, one embedding per orientation of every database edge
+    src = np.repeat(np.arange(graphs.total_nodes, dtype=np.int64), graphs.degrees())
+    dst = graphs.adj_indices
+    gid = graphs.graph_of_node()[src]
+    key = (((graphs.node_labels[src].astype(np.int64) + 1) << 32)
+           | ((graphs.adj_labels.astype(np.int64) + 1) << 16)
+           | (graphs.node_labels[dst].astype(np.int64) + 1))
+    order = np.argsort(key, kind='stable')
+    key, src, dst, gid = key[order], src[order], dst[order], gid[order]
+    bounds = np.flatnonzero(np.diff(key)) + 1
+
+    table = _edge_table(graphs)
+    seen, out = set(), []
+    for lo, hi in zip(np.r_[0, bounds], np.r_[bounds, len(key)]):
+        if hi <= lo:
+            continue
+        support = len(np.unique(gid[lo:hi]))
+        if support < min_count:
+            continue
+        k = int(key[lo])
+        labels = [(k >> 32) - 1, (k & 0xFFFF) - 1]
+        edges = [(0, 1, ((k >> 16) & 0xFFFF) - 1)]
+        code = canonical_tree_code(labels, edges)
+        if code in seen:
+            continue
+        seen.add(code)
+        _grow(graphs, table, TreePattern(labels, edges, gid[lo:hi], np.column_stack([src[lo:hi], dst[lo:hi]]),
+                                  support),
+              min_count, max_edges, seen, out)
+    return out
+
+def mine_tree_features(graphs, top_k=50, min_support=0.1, max_edges=4):
+    """
+    The top_k single edges of mine_features, plus up to top_k multi-edge
+    frequent trees. Trees are ranked by p * (1 - p) of their support fraction
+    p, i.e. how likely they are to separate a query from a database graph;
+    ties go to larger trees. Rare single edges stay in because they are the
+    most selective features, and a support threshold would drop them.
+    """
+    edges = mine_features(graphs, top_k=top_k)
+
+    print(f"Mining trees with up to {max_edges} edges at {min_support:.0%} support "
+          f"from {len(graphs)} graphs...")
+    trees = [t for t in mine_frequent_trees(graphs, min_support, max_edges) if len(t.edges) > 1]
+    print(f"Found {len(trees)} frequent multi-edge trees")
+
+    n = max(len(graphs), 1)
+    ranked = sorted(trees, key=lambda t: (-(t.support / n) * (1 - t.support / n), -len(t.edges)))
+    return edges + [t.to_networkx() for t in ranked[:top_k]]
+
 def save_subgraphs(subgraphs, output_path):
     with open(output_path, 'w') as f:
         for idx, G in enumerate(subgraphs):
@@ -84,10 +235,19 @@ def save_subgraphs(subgraphs, output_path):
     print(f"Saved {len(subgraphs)} features to {output_path}")
 
 if __name__ == "__main__":
-    if len(sys.argv) < 3:
-        print("Usage: python3 simple_miner.py <input> <output>")
-        sys.exit(1)
+    parser = argparse.ArgumentParser(usage="python3 simple_miner.py <input> <output>")
+    parser.add_argument('input')
+    parser.add_argument('output')
+    parser.add_argument('--top-k', type=int, default=50)
+    parser.add_argument('--max-edges', type=int, default=4,
+                        help="Largest tree to grow; 1 keeps the single-edge miner")
+    parser.add_argument('--min-support', type=float, default=0.1,
+                        help="Minimum fraction of graphs a tree must occur in")
+    args = parser.parse_args()
         
-    graphs = load_graphs(sys.argv[1])
-    features = mine_features(graphs, top_k=50)
-    save_subgraphs(features, sys.argv[2])
\ No newline at end of file
+    graphs = load_graphs(args.input)
+    if args.max_edges > 1:
+        features = mine_tree_features(graphs, args.top_k, args.min_support, args.max_edges)
+    else:
+        features = mine_features(graphs, top_k=args.top_k)
+    save_subgraphs(features, args.output)
\ No newline at end of file
@@ -0,0 +1,159 @@
+import numpy as np
+
+# Backtracking matcher for tiny labelled patterns on GraphDB graphs. It
+# answers the same question as networkx's GraphMatcher.subgraph_is_isomorphic
+# (node-induced, labels compared on nodes and edges) without building nx graphs.
+
+class SmallPattern:
+    """
+    A pattern prepared for matching.
+
+    order   pattern nodes in matching order (rarest label first, then
+            always a node adjacent to one already placed where possible)
+    parent  for each position in order, an earlier position adjacent to it,
+            or -1 when the node starts a new component
+    checks  for each position, (earlier position, edge label or None) for
+            every earlier node, None meaning the pair must not be adjacent
+    """
+
+    def __init__(self, labels, degrees, order, parent, checks, self_loops):
+        self.labels = labels
+        self.degrees = degrees
+        self.order = order
+        self.parent = parent
+        self.checks = checks
+        self.self_loops = self_loops
+
+class PreparedGraph:
+    """One database graph as Python lists: labels, degrees, adjacency dicts."""
+
+    def __init__(self, labels, degrees, adj, by_label):
+        self.labels = labels
+        self.degrees = degrees
+        self.adj = adj
+        self.by_label = by_label
+
+def label_frequencies(db):
+    """Label -> number of nodes carrying it across the whole database."""
+    labels, counts = np.unique(db.node_labels, return_counts=True)
+    return dict(zip(labels.tolist(), counts.tolist()))
+
+def _local_adjacency(db, g):
+    lo, hi = int(db.node_offsets[g]), int(db.node_offsets[g + 1])
+    a_lo = int(db.adj_offsets[lo])
+    ptr = (db.adj_offsets[lo:hi + 1] - a_lo).tolist()
+    nbrs = (db.adj_indices[a_lo:int(db.adj_offsets[hi])] - lo).tolist()
+    elbls = db.adj_labels[a_lo:int(db.adj_offsets[hi])].tolist()
+    adj = [dict(zip(nbrs[ptr[k]:ptr[k + 1]], elbls[ptr[k]:ptr[k + 1]])) for k in range(hi - lo)]
+    return db.node_labels[lo:hi].tolist(), adj
+
+def prepare_graph(db, g):
+    labels, adj = _local_adjacency(db, g)
+    by_label = {}
+    for v, lbl in enumerate(labels):
+        by_label.setdefault(lbl, []).append(v)
+    return PreparedGraph(labels, [len(a) for a in adj], adj, by_label)
+
+def prepare_pattern(db, p, label_freq):
+    labels, adj = _local_adjacency(db, p)
+    k = len(labels)
+    degrees = [len(a) for a in adj]
+
+    def rank(v):
+        return (label_freq.get(labels[v], 0), -degrees[v])
+
+    order, placed = [], set()
+    while len(order) < k:
+        frontier = {u for v in order for u in adj[v] if u not in placed}
+        pool = frontier if frontier else [v for v in range(k) if v not in placed]
+        nxt = min(pool, key=lambda v: (rank(v), v))
+        order.append(nxt)
+        placed.add(nxt)
+
+    position = {v: i for i, v in enumerate(order)}
+    parent, checks = [], []
+    for i, v in enumerate(order):
+        earlier = [position[u] for u in adj[v] if u != v and position[u] < i]
+        parent.append(min(earlier) if earlier else -1)
+        checks.append([(j, adj[v].get(order[j])) for j in range(i)])
+
+    self_loops = [adj[v].get(v) for v in order]
+    return SmallPattern([labels[v] for v in order], [degrees[v] for v in order],
+                        order, parent, checks, self_loops)
+
+def prepare_patterns(db, label_freq):
+    return [prepare_pattern(db, p, label_freq) for p in range(len(db))]
+
+def _embeddings(graph, pattern):
+    """Yields every node-induced, label-preserving embedding as a mapping list."""
+    k = len(pattern.labels)
+    if k == 0:
+        yield []
+        return
+    if k > len(graph.labels):
+        return
+
+    labels, degrees, adj = graph.labels, graph.degrees, graph.adj
+    p_labels, p_degrees = pattern.labels, pattern.degrees
+    parent, checks, loops = pattern.parent, pattern.checks, pattern.self_loops
+
+    for i in range(k):
+        if p_labels[i] not in graph.by_label:
+            return
+
+    mapping = [-1] * k
+    used = set()
+
+    def candidates(i):
+        if parent[i] >= 0:
+            return adj[mapping[parent[i]]]
+        return graph.by_label[p_labels[i]]
+
+    def feasible(i, v):
+        if v in used or labels[v] != p_labels[i] or degrees[v] < p_degrees[i]:
+            return False
+        if adj[v].get(v) != loops[i]:
+            return False
+        row = adj[v]
+        for j, elbl in checks[i]:
+            if row.get(mapping[j]) != elbl:
+                return False
+        return True
+
+    # Iterative backtracking: stack of candidate iterators, one per depth
+    stack = [iter(candidates(0))]
+    while stack:
+        i = len(stack) - 1
+        if mapping[i] >= 0:
+            used.discard(mapping[i])
+            mapping[i] = -1
+        for v in stack[-1]:
+            if feasible(i, v):
+                mapping[i] = v
+                used.add(v)
+                break
+        else:
+            stack.pop()
+            continue
+        if i + 1 == k:
+            yield mapping
+            continue
+        stack.append(iter(candidates(i + 1)))
+
+def contains(graph, pattern):
+    """True if pattern has a node-induced, label-preserving embedding in graph."""
+    for _ in _embeddings(graph, pattern):
+        return True
+    return False
+
+def count_embeddings(graph, pattern, cap):
+    """
+    Number of distinct occurrences (embedded node sets) of pattern in graph,
+    counting no further than cap. Automorphic mappings count once.
+    """
+    occurrences = set()
+    for mapping in _embeddings(graph, pattern):
+        occurrences.add(frozenset(mapping))
+        if len(occurrences) >= cap:
+            break
+    return len(occurrences)
@@ -0,0 +1,148 @@
+import sys
+import time
+import argparse
+import multiprocessing as mp
+import numpy as np
+
+import small_matcher
+from convert import parse_graph_file, vf2_contains, MATCHERS
+from feature_bits import load_features
+from candidate_lists import CandidateLists, is_candidate_file
+from generate_candidates import block_sizes, candidate_blocks, choose_engine, prepare_operands
+
+def read_candidates(path):
+    """
+    Reads a 'q # / c #' text file, or a binary .cand file, into a list of
+    (query id, candidate id array).
+    """
+    if is_candidate_file(path):
+        return list(CandidateLists(path))
+    entries = []
+    qid = None
+    with open(path, 'r') as f:
+        for line in f:
+            if line.startswith('q #'):
+                qid = int(line[3:])
+            elif line.startswith('c #') and qid is not None:
+                entries.append((qid, np.array(line[3:].split(), dtype=np.int64)))
+                qid = None
+    return entries
+
+def filter_candidates(db_features_path, query_features_path):
+    """Runs the in-memory candidate filter and returns its (query id, ids) list."""
+    db_feats = load_features(db_features_path)
+    query_feats = load_features(query_features_path)
+    engine = choose_engine(db_feats, query_feats)
+    db, queries = prepare_operands(db_feats, query_feats, engine)
+    query_block, db_block = block_sizes(len(db), db.shape[1], engine, 64 << 20)
+    return [(q_start + k, c)
+            for q_start, lists in candidate_blocks(db, queries, engine, query_block, db_block,
+                                                   64 << 20)
+            for k, c in enumerate(lists)]
+
+# Worker state: each process loads both graph files once in _init_worker
+_db = None
+_queries = None
+_matcher = None
+_label_freq = None
+_prepared = {}
+
+def _init_worker(db_path, query_path, matcher):
+    global _db, _queries, _matcher, _label_freq
+    _db = parse_graph_file(db_path, is_gspan_format=False)
+    _queries = parse_graph_file(query_path, is_gspan_format=False)
+    _matcher = matcher
+    if matcher == 'small':
+        _label_freq = small_matcher.label_frequencies(_db)
+
+def _query_pattern(qid):
+    if qid not in _prepared:
+        _prepared.clear()
+        if _matcher == 'small':
+            _prepared[qid] = small_matcher.prepare_pattern(_queries, qid, _label_freq)
+        else:
+            _prepared[qid] = _queries[qid]
+    return _prepared[qid]
+
+def _verify_task(task):
+    qid, candidates = task
+    pattern = _query_pattern(qid)
+    if _matcher == 'small':
+        hits = [g for g in candidates.tolist()
+                if small_matcher.contains(small_matcher.prepare_graph(_db, g), pattern)]
+    else:
+        hits = [g for g in candidates.tolist() if vf2_contains(_db[g], pattern)]
+    return qid, np.array(hits, dtype=np.int64)
+
+def split_tasks(entries, task_size):
+    """Cuts long candidate lists into task_size pieces so the pool stays balanced."""
+    for qid, candidates in entries:
+        for start in range(0, max(len(candidates), 1), task_size):
+            yield qid, candidates[start:start + task_size]
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Verify filtered candidates with subgraph isomorphism in a process pool")
+    parser.add_argument('db_graphs_path')
+    parser.add_argument('query_graphs_path')
+    parser.add_argument('output_path', help="Exact answers, in the same 'q # / c #' format")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--candidates', help="Text or --binary output of generate_candidates.py")
+    source.add_argument('--features', nargs=2, metavar=('DB_FEATURES', 'QUERY_FEATURES'),
+                        help="Run (and time) the candidate filter here instead")
+    parser.add_argument('--workers', type=int, default=mp.cpu_count())
+    parser.add_argument('--matcher', choices=MATCHERS, default='vf2')
+    parser.add_argument('--task-size', type=int, default=256,
+                        help="Candidates per pool task")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    try:
+        if args.features:
+            entries = filter_candidates(*args.features)
+        else:
+            entries = read_candidates(args.candidates)
+    except (IOError, ValueError) as e:
+        print(f"Error loading candidates: {e}")
+        sys.exit(1)
+    filter_time = time.perf_counter() - start
+    filter_label = "filtering" if args.features else "loading candidates"
+
+    num_queries = len(entries)
+    num_candidates = sum(len(c) for _, c in entries)
+    print(f"Verifying {num_candidates} candidates for {num_queries} queries "
+          f"({args.workers} workers, {args.matcher})...")
+
+    start = time.perf_counter()
+    answers = {qid: [] for qid, _ in entries}
+    done = 0
+    with mp.Pool(args.workers, initializer=_init_worker,
+                 initargs=(args.db_graphs_path, args.query_graphs_path, args.matcher)) as pool:
+        for qid, hits in pool.imap(_verify_task, split_tasks(entries, args.task_size)):
+            answers[qid].append(hits)
+            done += 1
+            if done % 100 == 0:
+                print(f"Verified {done} tasks...", end='\r')
+    verify_time = time.perf_counter() - start
+
+    num_answers = 0
+    try:
+        with open(args.output_path, 'w') as f:
+            for qid, _ in entries:
+                hits = np.concatenate(answers[qid]) if answers[qid] else np.zeros(0, dtype=np.int64)
+                num_answers += len(hits)
+                f.write(f"q # {qid}\n")
+                f.write(f"c # {' '.join(map(str, hits.tolist()))}\n")
+    except IOError as e:
+        print(f"Error writing to output file: {e}")
+        sys.exit(1)
+
+    precision = num_answers / num_candidates if num_candidates else 1.0
+    total_time = filter_time + verify_time
+    print(f"\nAnswers: {num_answers} of {num_candidates} candidates "
+          f"(filter precision {precision:.3f})")
+    print(f"Time: {filter_label} {filter_time:.2f}s, verifying {verify_time:.2f}s")
+    print(f"Throughput: {num_queries / max(total_time, 1e-9):.1f} queries/s")
+
+if __name__ == "__main__":
+    main()